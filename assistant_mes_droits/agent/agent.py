@@ -1,15 +1,35 @@
+import asyncio
+import os
+
 from langchain_core.messages import HumanMessage
 
+from assistant_mes_droits.agent.answer_cache import CachedAgent
+from assistant_mes_droits.agent.clients import checkpointer, redis_client, store
 from assistant_mes_droits.agent.mes_droits_agent import (
     AgentState,
     MesDroitsAgent,
     search,
 )
 
+# "strict" (two LLM calls after the search) or "fast" (a single one)
+AGENT_MODE = os.environ.get("AGENT_MODE", "strict")
+# Search the user's question while the search queries are generated
+SPECULATIVE_RETRIEVAL = os.environ.get("SPECULATIVE_RETRIEVAL", "") in ("1", "true")
+
 
-def build_agent():
-    agent = MesDroitsAgent(search_tools=[search])
+def build_agent(mode: str = AGENT_MODE, speculative: bool = SPECULATIVE_RETRIEVAL):
+    agent = MesDroitsAgent(
+        search_tools=[search],
+        mode=mode,
+        speculative=speculative,
+        checkpointer=checkpointer,
+    )
 
+    # Final answers are cached in Redis when available
+    if redis_client is not None:
+        return CachedAgent(
+            agent.graph, store, redis_client, prefix=f"answer_cache:{mode}"
+        )
     return agent.graph
 
 
@@ -22,7 +42,7 @@ if __name__ == "__main__":
 
     config = {"configurable": {"thread_id": "1"}}
 
-    state_dict = _agent.invoke(initial_state, config=config)
+    state_dict = asyncio.run(_agent.ainvoke(initial_state, config=config))
 
     state = AgentState(**state_dict)
 
@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from redis import Redis, RedisError
+
+from assistant_mes_droits.agent.search_cache import normalize_query
+from assistant_mes_droits.logger import logger
+
+ANSWER_NODE = "generate_response"
+
+
+def conversation_key(messages: list) -> str:
+    """
+    Hash of the normalized human and AI turns of a conversation, tool calls
+    and results are left out. A single question hashes its own text.
+    """
+    turns = [
+        (message.type, normalize_query(message.content))
+        for message in messages
+        if isinstance(message, (HumanMessage, AIMessage))
+        and isinstance(message.content, str)
+        and message.content
+    ]
+    return hashlib.sha256(json.dumps(turns).encode()).hexdigest()
+
+
+class CachedAgent:
+    """
+    Redis cache of final answers in front of the compiled agent graph.
+
+    Answers are keyed by the corpus generation and the normalized conversation,
+    and expire after `ttl` seconds; every `add_publications` run moves to a new
+    generation, which invalidates them. Each entry is a hash holding the answer
+    and the number of times it was served.
+
+    Concurrent misses on the same key run the graph once: requests of this
+    process wait on the running one, requests of other processes wait for the
+    Redis lock of the key to be released, polling for the answer, and run the
+    graph themselves after `lock_timeout` seconds.
+
+    With a checkpointer, the key covers the messages already in the thread of
+    the request, and a cached answer is added to that thread.
+
+    Redis errors are logged and fall back to the graph.
+    """
+
+    def __init__(
+        self,
+        graph,
+        store,
+        redis: Redis,
+        ttl: int = 6 * 3600,
+        lock_timeout: float = 60.0,
+        poll_interval: float = 0.2,
+        prefix: str = "answer_cache",
+    ):
+        self.graph = graph
+        self.store = store
+        self.redis = redis
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _key(self, messages: list) -> str:
+        self.store.refresh()
+        return f"{self.prefix}:{self.store.generation}:{conversation_key(messages)}"
+
+    def _get(self, key: str) -> Optional[AIMessage]:
+        data = self.redis.hget(key, "answer")
+        if data is None:
+            return None
+        self.redis.hincrby(key, "hits", 1)
+        return messages_from_dict([json.loads(data)])[0]
+
+    def _set(self, key: str, answer: AIMessage) -> None:
+        self.redis.hset(
+            key, mapping={"answer": json.dumps(message_to_dict(answer)), "hits": 0}
+        )
+        self.redis.expire(key, self.ttl)
+        self.redis.delete(f"{key}:lock")
+
+    def _lock(self, key: str) -> bool:
+        return bool(
+            self.redis.set(f"{key}:lock", 1, nx=True, ex=int(self.lock_timeout))
+        )
+
+    def hit_count(self, messages: list) -> int:
+        """Number of times the cached answer of a conversation was served."""
+        return int(self.redis.hget(self._key(messages), "hits") or 0)
+
+    async def _cached(self, messages: list):
+        """The key and cached answer, None for both when Redis is unavailable."""
+        try:
+            key = await asyncio.to_thread(self._key, messages)
+            return key, await asyncio.to_thread(self._get, key)
+        except RedisError as e:
+            logger.warning(f"Answer cache unavailable: {e}")
+            return None, None
+
+    async def _wait_for_other_process(self, key: str) -> Optional[AIMessage]:
+        """Answer computed by the process holding the lock, None if we got it."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_timeout
+        while not await asyncio.to_thread(self._lock, key):
+            if loop.time() > deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+            answer = await asyncio.to_thread(self._get, key)
+            if answer is not None:
+                return answer
+        return None
+
+    async def _store(self, key: str, answer: AIMessage) -> None:
+        try:
+            await asyncio.to_thread(self._set, key, answer)
+        except RedisError as e:
+            logger.warning(f"Answer cache unavailable: {e}")
+
+    async def _unlock(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(self.redis.delete, f"{key}:lock")
+        except RedisError as e:
+            logger.warning(f"Answer cache unavailable: {e}")
+
+    def _thread_id(self, config) -> Optional[str]:
+        if getattr(self.graph, "checkpointer", None) is None:
+            return None
+        return ((config or {}).get("configurable") or {}).get("thread_id")
+
+    async def _history(self, config) -> list:
+        """Messages already in the checkpointed thread of config."""
+        if self._thread_id(config) is None:
+            return []
+        state = await self.graph.aget_state(config)
+        return state.values.get("messages", [])
+
+    async def _record(self, input, config, answer: AIMessage) -> None:
+        """Add the question and its cached answer to the thread of config."""
+        answer = answer.model_copy(update={"id": None})
+        await self.graph.aupdate_state(
+            config, {"messages": list(input.messages) + [answer]}, as_node=ANSWER_NODE
+        )
+
+    async def _answer(self, input, config, run) -> AIMessage:
+        """
+        Answer of the thread history followed by the input messages. When it
+        does not come from `run`, it is added to the thread like a graph run.
+        """
+        ran = False
+
+        async def run_once():
+            nonlocal ran
+            ran = True
+            return await run()
+
+        history = await self._history(config)
+        answer = await self._shared_answer(history + list(input.messages), run_once)
+        if not ran and self._thread_id(config) is not None:
+            await self._record(input, config, answer)
+        return answer
+
+    async def _shared_answer(self, messages: list, run) -> AIMessage:
+        """
+        Cached answer of the conversation, else the answer of `run`, computed
+        once for all the concurrent requests on the same conversation.
+        """
+        key, answer = await self._cached(messages)
+        if answer is not None:
+            self.hits += 1
+            return answer
+        if key is None:
+            return await run()
+
+        if key in self._in_flight:
+            self.hits += 1
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            try:
+                answer = await self._wait_for_other_process(key)
+            except RedisError as e:
+                logger.warning(f"Answer cache unavailable: {e}")
+            if answer is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                answer = await run()
+                await self._store(key, answer)
+            future.set_result(answer)
+            return answer
+        except BaseException as e:
+            await self._unlock(key)
+            future.set_exception(e)
+            # Nobody else may be waiting, don't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def ainvoke(self, input, config=None, **kwargs) -> dict:
+        """Same as the graph's ainvoke, the final answer may come from the cache."""
+        result = {}
+
+        async def run():
+            result.update(await self.graph.ainvoke(input, config=config, **kwargs))
+            return result["messages"][-1]
+
+        answer = await self._answer(input, config, run)
+        return result or {"messages": list(input.messages) + [answer]}
+
+    async def astream(self, input, config=None, stream_mode="values", **kwargs):
+        """
+        Same as the graph's astream. A cached answer is streamed as if the
+        generate_response node had produced it in a single token.
+        """
+        modes = [stream_mode] if isinstance(stream_mode, str) else list(stream_mode)
+        chunks = asyncio.Queue()
+
+        async def run():
+            answer = None
+            async for mode, chunk in self.graph.astream(
+                input,
+                config=config,
+                stream_mode=list(dict.fromkeys(modes + ["updates"])),
+                **kwargs,
+            ):
+                if mode == "updates" and ANSWER_NODE in chunk:
+                    answer = chunk[ANSWER_NODE]["messages"][-1]
+                if mode in modes:
+                    chunks.put_nowait((mode, chunk))
+            if answer is None:
+                raise ValueError(f"The graph run did not reach {ANSWER_NODE}")
+            return answer
+
+        task = asyncio.ensure_future(self._answer(input, config, run))
+        streamed = False
+        while not (task.done() and chunks.empty()):
+            getter = asyncio.ensure_future(chunks.get())
+            await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                streamed = True
+                yield self._format(getter.result(), stream_mode)
+            else:
+                getter.cancel()
+
+        answer = task.result()
+        if not streamed:
+            for chunk in self._replay(input, answer, modes):
+                yield self._format(chunk, stream_mode)
+
+    @staticmethod
+    def _replay(input, answer: AIMessage, modes: List[str]):
+        # Same order as a graph run: the tokens, then the node update
+        if "messages" in modes:
+            chunk = AIMessageChunk(content=answer.content, id=answer.id)
+            yield "messages", (chunk, {"langgraph_node": ANSWER_NODE})
+        if "updates" in modes:
+            yield "updates", {ANSWER_NODE: {"messages": [answer]}}
+        if "values" in modes:
+            yield "values", {"messages": list(input.messages) + [answer]}
+
+    @staticmethod
+    def _format(chunk, stream_mode):
+        return chunk[1] if isinstance(stream_mode, str) else chunk
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
@@ -0,0 +1,250 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from redis import Redis
+
+
+def _dump(typed: tuple[str, bytes]) -> bytes:
+    return typed[0].encode() + b":" + typed[1]
+
+
+def _load(data: bytes) -> tuple[str, bytes]:
+    type_, _, value = data.partition(b":")
+    return type_.decode(), value
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver[int]):
+    """
+    LangGraph checkpointer keeping the latest checkpoint of each thread in Redis.
+
+    A thread is a single Redis hash, expiring `ttl` seconds after its last
+    write, so dropping a conversation is a single DEL. Only the latest
+    checkpoint of each namespace is kept with its pending writes: a graph run
+    resumes from it, but the history of earlier checkpoints is not available.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        ttl: int = 7 * 24 * 3600,
+        prefix: str = "checkpoint",
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, thread_id: str) -> str:
+        return f"{self.prefix}:{thread_id}"
+
+    @staticmethod
+    def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> dict:
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }
+        }
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        fields = self.redis.hgetall(self._key(thread_id))
+        saved = fields.get(f"{checkpoint_ns}|checkpoint".encode())
+        if saved is None:
+            return None
+        checkpoint_id, metadata, parent_id = self.serde.loads_typed(_load(saved))
+        if get_checkpoint_id(config) not in (None, checkpoint_id):
+            return None
+
+        writes_prefix = f"{checkpoint_ns}|writes|{checkpoint_id}|".encode()
+        writes = sorted(
+            self.serde.loads_typed(_load(value))
+            for field, value in fields.items()
+            if field.startswith(writes_prefix)
+        )
+        return CheckpointTuple(
+            config=self._config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed(
+                _load(fields[f"{checkpoint_ns}|state".encode()])
+            ),
+            metadata=metadata,
+            parent_config=(
+                self._config(thread_id, checkpoint_ns, parent_id) if parent_id else None
+            ),
+            pending_writes=[(task_id, c, v) for _, _, task_id, c, v in writes],
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """The latest checkpoint of the thread, if it matches the criteria."""
+        if config is None or limit == 0:
+            return
+        saved = self.get_tuple(config)
+        if saved is None:
+            return
+        if before and get_checkpoint_id(before) <= saved.config["configurable"].get(
+            "checkpoint_id"
+        ):
+            return
+        if filter and any(saved.metadata.get(k) != v for k, v in filter.items()):
+            return
+        yield saved
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._key(thread_id)
+        saved = (
+            checkpoint["id"],
+            get_checkpoint_metadata(config, metadata),
+            config["configurable"].get("checkpoint_id"),
+        )
+        # The writes of the previous checkpoint are not needed anymore
+        old_writes = [
+            field
+            for field in self.redis.hkeys(key)
+            if field.startswith(f"{checkpoint_ns}|writes|".encode())
+        ]
+        pipeline = self.redis.pipeline()
+        if old_writes:
+            pipeline.hdel(key, *old_writes)
+        pipeline.hset(
+            key,
+            mapping={
+                f"{checkpoint_ns}|checkpoint": _dump(self.serde.dumps_typed(saved)),
+                f"{checkpoint_ns}|state": _dump(self.serde.dumps_typed(checkpoint)),
+            },
+        )
+        pipeline.expire(key, self.ttl)
+        pipeline.execute()
+        return self._config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        mapping = {}
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            field = f"{checkpoint_ns}|writes|{checkpoint_id}|{task_id}|{idx}"
+            entry = (task_path, idx, task_id, channel, value)
+            mapping[field] = _dump(self.serde.dumps_typed(entry))
+        if mapping:
+            key = self._key(thread_id)
+            self.redis.hset(key, mapping=mapping)
+            self.redis.expire(key, self.ttl)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.redis.delete(self._key(thread_id))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        saved = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in saved:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """
+    InMemorySaver keeping at most `max_threads` threads, the least recently
+    written ones are deleted first. Fallback when Redis is not available.
+    """
+
+    def __init__(self, max_threads: int = 1000, serde=None):
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self._threads: OrderedDict[str, None] = OrderedDict()
+        self._threads_lock = threading.Lock()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        with self._threads_lock:
+            self._threads[thread_id] = None
+            self._threads.move_to_end(thread_id)
+            evicted = []
+            while len(self._threads) > self.max_threads:
+                evicted.append(self._threads.popitem(last=False)[0])
+        for old_thread_id in evicted:
+            super().delete_thread(old_thread_id)
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._threads_lock:
+            self._threads.pop(thread_id, None)
+        super().delete_thread(thread_id)
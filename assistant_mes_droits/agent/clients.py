@@ -3,7 +3,13 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
+from redis import Redis
 
+from assistant_mes_droits.agent.checkpointer import (
+    BoundedInMemorySaver,
+    RedisCheckpointSaver,
+)
+from assistant_mes_droits.agent.search_cache import CachedSearch
 from assistant_mes_droits.vector_store.vector_store import PublicationVectorStore
 
 dot_env_path = Path(__file__).parents[2] / ".env"
@@ -11,8 +17,21 @@ if dot_env_path.is_file():
     load_dotenv(dotenv_path=dot_env_path)
 
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+REDIS_URI = os.environ.get("REDIS_URI")
 
 client = ChatGoogleGenerativeAI(
     api_key=GOOGLE_API_KEY, model="gemini-2.0-flash-001", temperature=0, max_retries=10
 )
 store = PublicationVectorStore()
+# REDIS_URI can also be another slowapi storage, such as memory://
+redis_client = (
+    Redis.from_url(REDIS_URI)
+    if REDIS_URI and REDIS_URI.startswith(("redis://", "rediss://", "unix://"))
+    else None
+)
+# Search results are cached in Redis when available
+search_store = CachedSearch(store, redis_client) if redis_client else store
+# Conversation threads live in Redis, in memory when it is not available
+checkpointer = (
+    RedisCheckpointSaver(redis_client) if redis_client else BoundedInMemorySaver()
+)
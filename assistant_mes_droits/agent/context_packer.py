@@ -0,0 +1,121 @@
+import os
+import re
+from typing import List, Optional, Set
+
+from langchain_core.documents import Document
+
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", 6000))
+
+# Sections and lines of PublicationModel.to_markdown that carry no answer
+BOILERPLATE_SECTIONS = ("related links",)
+BOILERPLATE_PREFIXES = ("# ", "**ID**:", "**URL**:", "**Path**:")
+SOURCE_PREFIX = "Source: "
+
+
+def _normalize(line: str) -> str:
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+
+def _score(doc: Document) -> Optional[float]:
+    return doc.metadata.get("rrf_score", doc.metadata.get("score"))
+
+
+def content_lines(text: str) -> List[str]:
+    """Lines of a fiche's markdown, without headers, links list and breadcrumbs."""
+    lines = []
+    section = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("## "):
+            section = stripped[3:].strip().lower()
+            continue
+        if not stripped or section in BOILERPLATE_SECTIONS:
+            continue
+        if stripped.startswith(BOILERPLATE_PREFIXES):
+            continue
+        lines.append(stripped)
+    return lines
+
+
+def packed_sources(context: str) -> Set[str]:
+    """The sp_url of every fiche of a packed context."""
+    return {
+        line[len(SOURCE_PREFIX) :].strip()
+        for line in context.splitlines()
+        if line.startswith(SOURCE_PREFIX)
+    }
+
+
+def _truncate(line: str, size: int) -> str:
+    cut = line[:size].rsplit(" ", 1)[0]
+    return f"{cut}…"
+
+
+class ContextPacker:
+    """
+    Pack retrieved fiches into a context that fits in a token budget.
+
+    Fiches are taken by decreasing score (`rrf_score`, else `score`, else
+    retrieval order). Each one is stripped of its markdown boilerplate and of
+    the lines already packed from a better ranked fiche, then cut to
+    `max_fiche_tokens`, until `max_tokens` is spent. Tokens are estimated from
+    the length of the text with `chars_per_token`.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CONTEXT_MAX_TOKENS,
+        max_fiche_tokens: int = 1500,
+        chars_per_token: float = 4.0,
+        min_fiche_tokens: int = 50,
+    ):
+        self.max_chars = int(max_tokens * chars_per_token)
+        self.max_fiche_chars = int(max_fiche_tokens * chars_per_token)
+        self.min_fiche_chars = int(min_fiche_tokens * chars_per_token)
+
+    def rank(self, docs: List[Document]) -> List[Document]:
+        order = {id(doc): i for i, doc in enumerate(docs)}
+        return sorted(
+            docs,
+            key=lambda d: (
+                _score(d) is None,
+                -(_score(d) or 0.0),
+                order[id(d)],
+            ),
+        )
+
+    def pack_fiche(self, doc: Document, seen: set, budget: int) -> Optional[str]:
+        """The compacted text of one fiche, None when nothing new fits."""
+        title = doc.metadata.get("title") or "Sans titre"
+        header = f"## {title}\n{SOURCE_PREFIX}{doc.metadata.get('sp_url')}"
+        budget = min(budget, self.max_fiche_chars) - len(header) - 1
+        body = []
+        for line in content_lines(doc.page_content):
+            key = _normalize(line)
+            if key in seen:
+                continue
+            if len(line) + 1 > budget:
+                if budget > self.min_fiche_chars:
+                    body.append(_truncate(line, budget - 2))
+                break
+            seen.add(key)
+            body.append(line)
+            budget -= len(line) + 1
+        if not body:
+            return None
+        return "\n".join([header] + body)
+
+    def pack(self, docs: List[Document]) -> str:
+        """Rank, clean, deduplicate and trim fiches into a single context."""
+        seen = set()
+        fiches = []
+        remaining = self.max_chars
+        for doc in self.rank(docs):
+            if remaining < self.min_fiche_chars:
+                break
+            fiche = self.pack_fiche(doc, seen, remaining)
+            if fiche is None:
+                continue
+            fiches.append(fiche)
+            remaining -= len(fiche) + 2
+        return "\n\n".join(fiches)
@@ -1,37 +1,99 @@
+import asyncio
+import re
 import uuid
-from operator import add
-from typing import Annotated, Optional
+from collections import Counter
+from contextvars import ContextVar
+from typing import Annotated, Any, Optional
 
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.documents import Document
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
 from langchain_core.tools import tool
 from langchain_core.tools.base import BaseTool
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
 
 from assistant_mes_droits.agent.clients import client as global_client
-from assistant_mes_droits.agent.clients import store
+from assistant_mes_droits.agent.clients import search_store
+from assistant_mes_droits.agent.context_packer import ContextPacker, packed_sources
+from assistant_mes_droits.agent.search_cache import CachedSearch, normalize_query
 from assistant_mes_droits.logger import logger
+from assistant_mes_droits.vector_store.vector_store import reciprocal_rank_fusion
+
+context_packer = ContextPacker()
+
+# strict: extract sourced assertions, then write the answer from them
+# fast: write the answer and its assertions in one call, check sources locally
+AGENT_MODES = ("strict", "fast")
+NO_SOURCED_ANSWER = (
+    "Je n'ai pas trouvé de source fiable pour répondre à votre question."
+)
+CITATION_PATTERN = re.compile(r"\s*\(\s*(https?://[^\s)]+)\s*\)")
+SEARCH_K = 20
+
+
+class SpeculativeSearch(BaseModel):
+    """Passages of the user's question, searched during generate_search_query."""
+
+    query: str
+    passages: list[Document] = Field(default_factory=list)
+
+
+# Set by use_search_tool for the search tool calls of the current run: the
+# passages searched speculatively, and the search store of the agent
+speculative_search: ContextVar[Optional[SpeculativeSearch]] = ContextVar(
+    "speculative_search", default=None
+)
+agent_search_store: ContextVar[Optional[Any]] = ContextVar(
+    "agent_search_store", default=None
+)
+
+
+def query_overlap(a: str, b: str) -> float:
+    """Jaccard similarity of the words of two normalized queries."""
+    words_a, words_b = set(normalize_query(a).split()), set(normalize_query(b).split())
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
 
 
 @tool
-def search(query: str) -> str:
+async def search(queries: list[str]) -> str:
     """
     Search in a vector store of French citizen rights. Use this tool to complement your answers.
     Generate your own queries to search the document database to better answer the user's questions.
+    Give several reformulations of the question in a single call rather than calling the tool several times.
     Always search first before answering.
     """
-    logger.info(f"Executing search tool with query: '{query}'")  # Added log
-    results = store.search(query, k=20)
+    logger.info(f"Executing search tool with queries: {queries}")  # Added log
+    store = agent_search_store.get() or search_store
+    speculative = speculative_search.get()
+    if speculative is None:
+        # Each publication is returned once, however many queries found it
+        results = await store.asearch_many(queries, k=SEARCH_K)
+    else:
+        # The question was searched already, only the other queries are left
+        question = normalize_query(speculative.query)
+        queries = [q for q in queries if normalize_query(q) != question]
+        passages = await store.asearch_passages(queries, k=SEARCH_K) if queries else []
+        results = reciprocal_rank_fusion([speculative.passages] + list(passages))
+    if isinstance(store, CachedSearch):
+        logger.info(f"Search cache stats: {store.stats}")
 
-    result = ""
-    for doc in results:
-        result += f"""{doc.metadata["title"]}\n{doc.page_content[:10_000]}"""
-
-    return result
+    # Best ranked fiches, without boilerplate, within the context budget
+    return context_packer.pack(results)
 
 
 class AgentState(BaseModel):
-    messages: Annotated[list, add] = Field(default_factory=list)
+    # add_messages appends, and removes the messages of RemoveMessage updates
+    messages: Annotated[list, add_messages] = Field(default_factory=list)
+    speculative: Optional[SpeculativeSearch] = None
 
 
 class Assertion(BaseModel):
@@ -45,55 +107,259 @@ class Assertions(BaseModel):
     assertions: list[Assertion] = Field(default_factory=list)
 
 
+class CitedAnswer(BaseModel):
+    answer: str = Field(
+        description="Answer in French, citing the URL of the source of each "
+        "assertion in the form ( https://SOURCE_URL )"
+    )
+    assertions: list[Assertion] = Field(
+        default_factory=list, description="Assertions made by the answer"
+    )
+
+
+def _normalize_source(url: str) -> str:
+    """Source URL without the surrounding spaces and trailing punctuation."""
+    return url.strip().rstrip(".,;")
+
+
+def remove_unknown_citations(answer: str, sources: set[str]) -> str:
+    """Remove the ( URL ) citations of sources that were not retrieved."""
+    sources = {_normalize_source(source) for source in sources}
+    return CITATION_PATTERN.sub(
+        lambda m: m.group(0) if _normalize_source(m.group(1)) in sources else "",
+        answer,
+    )
+
+
 class MesDroitsAgent:
-    def __init__(self, search_tools: list[BaseTool], client=global_client):
+    def __init__(
+        self,
+        search_tools: list[BaseTool],
+        client=global_client,
+        max_tool_concurrency: int = 5,
+        mode: str = "strict",
+        speculative: bool = False,
+        overlap_threshold: float = 0.5,
+        search_store=search_store,
+        checkpointer=None,
+        history_messages: int = 6,
+    ):
+        if mode not in AGENT_MODES:
+            raise ValueError(f"Unknown agent mode: {mode}")
+        self.mode = mode
+        self.speculative = speculative
+        self.overlap_threshold = overlap_threshold
+        self.search_store = search_store
+        self.speculation = Counter()
+        self.checkpointer = checkpointer
+        self.history_messages = history_messages
         self.search_tools = search_tools
+        self.max_tool_concurrency = max_tool_concurrency
         self.tool_mapping = {_tool.name: _tool for _tool in self.search_tools}
         self.graph = None
         self.client = client
         self.build_agent()
 
-    def generate_search_query(self, state: AgentState):
+    def _compacted(self, messages: list) -> list[RemoveMessage]:
+        """
+        Removals of the search calls, search results and assertions of
+        messages, and of all but the last `history_messages` questions and
+        answers.
+        """
+        turns = [
+            m
+            for m in messages
+            if isinstance(m, (HumanMessage, AIMessage))
+            and not getattr(m, "tool_calls", None)
+            and m.content
+        ]
+        kept = {m.id for m in turns[max(len(turns) - self.history_messages, 0) :]}
+        return [RemoveMessage(id=m.id) for m in messages if m.id not in kept]
+
+    async def compact_history(self, state: AgentState):
+        """
+        Compact the previous turns before they are sent to the LLM again.
+        end_turn already compacts the turns answered by a graph run, this
+        covers the ones added without it, such as cached answers.
+        """
+        last_question = max(
+            (i for i, m in enumerate(state.messages) if isinstance(m, HumanMessage)),
+            default=0,
+        )
+        past = state.messages[:last_question]
+        removed = self._compacted(past)
+        logger.info(
+            f"Node 'compact_history': Removed {len(removed)} of {len(past)} "
+            "messages of the previous turns"
+        )
+        return {"messages": removed, "speculative": None}
+
+    async def end_turn(self, state: AgentState):
+        """
+        Compact the thread once the answer is written, so that its checkpoint
+        does not keep the search results and speculative passages of the turn.
+        The answer is always kept, even empty: it is the result of the run.
+        """
+        answer_id = state.messages[-1].id if state.messages else None
+        removed = [m for m in self._compacted(state.messages) if m.id != answer_id]
+        logger.info(
+            f"Node 'end_turn': Removed {len(removed)} of {len(state.messages)} "
+            "messages"
+        )
+        return {"messages": removed, "speculative": None}
+
+    def _overlaps(self, question: str, tool_calls: list[dict]) -> bool:
+        queries = [
+            q
+            for c in tool_calls
+            if c["name"] == search.name
+            for q in c["args"].get("queries", [])
+        ]
+        return any(
+            query_overlap(question, query) >= self.overlap_threshold
+            for query in queries
+        )
+
+    async def _speculate(
+        self, question: Optional[str], result: AIMessage, task: Optional[asyncio.Task]
+    ) -> Optional[SpeculativeSearch]:
+        """Passages of the question if the generated queries overlap with it."""
+        if task is None:
+            return None
+        if not self._overlaps(question, result.tool_calls):
+            task.cancel()
+            self.speculation["discarded"] += 1
+            return None
+        try:
+            passages = (await task)[0]
+        except Exception as e:
+            logger.error(
+                f"Node 'generate_search_query': Speculative search failed: {e}"
+            )
+            self.speculation["failed"] += 1
+            return None
+        self.speculation["reused"] += 1
+        return SpeculativeSearch(query=question, passages=passages)
+
+    async def generate_search_query(self, state: AgentState):
+        question = next(
+            (
+                m.content
+                for m in reversed(state.messages)
+                if isinstance(m, HumanMessage)
+            ),
+            None,
+        )
+        task = None
+        if self.speculative and isinstance(question, str) and question.strip():
+            # Search the raw question while the LLM writes the search queries
+            task = asyncio.ensure_future(
+                self.search_store.asearch_passages([question], k=SEARCH_K)
+            )
+
         local_client = self.client.bind_tools(self.search_tools, tool_choice="any")
-        result = local_client.invoke(
-            [
-                SystemMessage(
-                    content="""You are a helpful assistant. 
+        try:
+            result = await local_client.ainvoke(
+                [
+                    SystemMessage(
+                        content="""You are a helpful assistant. 
                         Use the search tool to find relevant context about the user's question. 
                         Answer in French. 
                         """
-                )
-            ]
-            + state.messages
-        )
+                    )
+                ]
+                + state.messages
+            )
+        except BaseException:
+            if task is not None:
+                task.cancel()
+            raise
         logger.info(
             f"Node 'generate_search_query': Generated message: {result}"
         )  # Added log
-        return {"messages": [result]}
+        speculative = await self._speculate(question, result, task)
+        return {"messages": [result], "speculative": speculative}
+
+    async def _invoke_tool(self, tool_call: dict) -> ToolMessage:
+        """Run one tool call, turning its failure into an error ToolMessage."""
+        tool_name = tool_call["name"]
+        logger.info(
+            f"Node 'use_search_tool': Invoking tool '{tool_name}' with args: {tool_call}"
+        )  # Added log (logs entire tool_call dict)
+        try:
+            tool_result = await self.tool_mapping[tool_name].ainvoke(tool_call)
+        except Exception as e:
+            logger.error(f"Node 'use_search_tool': Tool '{tool_name}' failed: {e}")
+            return ToolMessage(
+                content=f"Error: the tool '{tool_name}' failed, ignore its results.",
+                tool_call_id=tool_call["id"],
+                name=tool_name,
+                status="error",
+            )
+        logger.info(
+            f"Node 'use_search_tool': Raw result from tool '{tool_name}': {tool_result}"
+        )  # Added log
+        return tool_result
+
+    @staticmethod
+    def _merge_search_calls(tool_calls: list[dict]) -> list[dict]:
+        """
+        Fold the queries of every `search` call into the first one, so that the
+        turn runs a single batched search and each fiche is returned once.
+        """
+        search_calls = [c for c in tool_calls if c["name"] == search.name]
+        if len(search_calls) <= 1:
+            return tool_calls
+        queries = [q for c in search_calls for q in c["args"].get("queries", [])]
+        merged = {**search_calls[0], "args": {"queries": queries}}
+        return [
+            merged if c is search_calls[0] else c
+            for c in tool_calls
+            if c["name"] != search.name or c is search_calls[0]
+        ]
 
-    def use_search_tool(self, state: AgentState):
+    async def use_search_tool(self, state: AgentState):
         logger.info(
             f"Node 'use_search_tool': Starting. Last message: {state.messages[-1]}"
         )  # Added log
         tool_calls: AIMessage = state.messages[-1]
-        results = []
-        for tool_call in tool_calls.tool_calls:
-            tool_name = tool_call["name"]
-            _tool = self.tool_mapping[tool_name]
-            logger.info(
-                f"Node 'use_search_tool': Invoking tool '{tool_name}' with args: {tool_call}"
-            )  # Added log (logs entire tool_call dict)
-            tool_result = _tool.invoke(tool_call)
-            logger.info(
-                f"Node 'use_search_tool': Raw result from tool '{tool_name}': {tool_result}"
-            )  # Added log
-            results.append(tool_result)
-
-        return {"messages": results}
-
-    def generate_assertions(self, state: AgentState):
+        calls = self._merge_search_calls(tool_calls.tool_calls)
+        semaphore = asyncio.Semaphore(self.max_tool_concurrency)
+
+        async def invoke(tool_call: dict) -> ToolMessage:
+            async with semaphore:
+                return await self._invoke_tool(tool_call)
+
+        # Calls run concurrently, gather keeps the ToolMessages in calls order
+        # The tasks copy the context, so every search call sees the speculation
+        # and searches the same store as the speculation
+        token = speculative_search.set(state.speculative)
+        store_token = agent_search_store.set(self.search_store)
+        try:
+            results = await asyncio.gather(*(invoke(c) for c in calls))
+        finally:
+            agent_search_store.reset(store_token)
+            speculative_search.reset(token)
+
+        # Every tool call needs an answer, merged searches point to the first one
+        answered = {message.tool_call_id for message in results}
+        messages = iter(results)
+        return {
+            "messages": [
+                next(messages)
+                if call["id"] in answered
+                else ToolMessage(
+                    content="Results merged into the previous search results.",
+                    tool_call_id=call["id"],
+                    name=call["name"],
+                )
+                for call in tool_calls.tool_calls
+            ]
+        }
+
+    async def generate_assertions(self, state: AgentState):
         local_client = self.client.with_structured_output(Assertions)
-        result = local_client.invoke(
+        result = await local_client.ainvoke(
             [
                 SystemMessage(
                     content=f"""You are a helpful assistant. 
@@ -131,9 +397,26 @@ class MesDroitsAgent:
             "messages": [ai_message, tool_message]
         }  # Return the already created message
 
-    def generate_response(self, state: AgentState):
+    def _without_search_results(self, messages: list) -> list:
+        """
+        Drop the search calls and their results, the sourced assertions that
+        generate_assertions extracted from them are all generate_response needs.
+        """
+        names = set(self.tool_mapping)
+        return [
+            message
+            for message in messages
+            if not (isinstance(message, ToolMessage) and message.name in names)
+            and not (
+                isinstance(message, AIMessage)
+                and message.tool_calls
+                and all(call["name"] in names for call in message.tool_calls)
+            )
+        ]
+
+    async def generate_response(self, state: AgentState):
         local_client = self.client
-        result = local_client.invoke(
+        result = await local_client.ainvoke(
             [
                 SystemMessage(
                     content="""You are a helpful assistant. 
@@ -145,28 +428,84 @@ class MesDroitsAgent:
                         """
                 )
             ]
-            + state.messages
+            + self._without_search_results(state.messages)
         )
         logger.info(
             f"Node 'generate_response': Generated message: {result}"
         )  # Added log
         return {"messages": [result]}
 
+    def _retrieved_sources(self, messages: list) -> set[str]:
+        names = set(self.tool_mapping)
+        return {
+            _normalize_source(source)
+            for message in messages
+            if isinstance(message, ToolMessage)
+            and message.name in names
+            and isinstance(message.content, str)
+            for source in packed_sources(message.content)
+        }
+
+    async def generate_cited_response(self, state: AgentState):
+        local_client = self.client.with_structured_output(CitedAnswer)
+        result = await local_client.ainvoke(
+            [
+                SystemMessage(
+                    content="""You are a helpful assistant. 
+                        Answer the user's question using the search results only.
+                        Cite the URL of the source for each of your assertions in the form ( https://SOURCE_URL )
+                        List every assertion of the answer with its source URL.
+                        If you cannot find relevant information say to the user that you are unable to answer.
+                        Write this as a single paragraph if possible.
+                        Answer in French.
+                        """
+                )
+            ]
+            + state.messages
+        )
+        # Only the URLs that the search actually returned count as sources
+        sources = self._retrieved_sources(state.messages)
+        cited = [
+            x
+            for x in result.assertions
+            if x.source and _normalize_source(x.source) in sources
+        ]
+        content = (
+            remove_unknown_citations(result.answer, sources)
+            if cited
+            else NO_SOURCED_ANSWER
+        )
+        message = AIMessage(content=content)
+        logger.info(
+            f"Node 'generate_response': Generated message: {message}, "
+            f"{len(cited)}/{len(result.assertions)} sourced assertions"
+        )
+        return {"messages": [message]}
+
     def build_agent(self):
-        logger.info("Building agent graph...")  # Added log
+        logger.info(f"Building agent graph in {self.mode} mode...")  # Added log
         builder = StateGraph(AgentState)
+        builder.add_node("compact_history", self.compact_history)
         builder.add_node("generate_search_query", self.generate_search_query)
         builder.add_node("use_search_tool", self.use_search_tool)
-        builder.add_node("generate_assertions", self.generate_assertions)
-        builder.add_node("generate_response", self.generate_response)
 
-        builder.add_edge(START, "generate_search_query")
+        builder.add_edge(START, "compact_history")
+        builder.add_edge("compact_history", "generate_search_query")
         builder.add_edge("generate_search_query", "use_search_tool")
-        builder.add_edge("use_search_tool", "generate_assertions")
-        builder.add_edge("generate_assertions", "generate_response")
-        builder.add_edge("generate_response", END)
+        if self.mode == "fast":
+            builder.add_node("generate_response", self.generate_cited_response)
+            builder.add_edge("use_search_tool", "generate_response")
+        else:
+            builder.add_node("generate_assertions", self.generate_assertions)
+            builder.add_node("generate_response", self.generate_response)
+            builder.add_edge("use_search_tool", "generate_assertions")
+            builder.add_edge("generate_assertions", "generate_response")
+        builder.add_node("end_turn", self.end_turn)
+        builder.add_edge("generate_response", "end_turn")
+        builder.add_edge("end_turn", END)
 
-        self.graph = builder.compile()
+        # With a checkpointer, the state of each thread_id is kept between turns
+        self.graph = builder.compile(checkpointer=self.checkpointer)
 
 
 if __name__ == "__main__":
@@ -176,7 +515,7 @@ if __name__ == "__main__":
         messages=[HumanMessage(content="est ce qu'il y'a une periode d'essaie?")],
     )
 
-    output_state = agent.graph.invoke(initial_state)
+    output_state = asyncio.run(agent.graph.ainvoke(initial_state))
 
     for message in output_state["messages"]:
         print(message.type)
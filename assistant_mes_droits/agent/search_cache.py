@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from redis import Redis, RedisError
+
+from assistant_mes_droits.logger import logger
+from assistant_mes_droits.vector_store.vector_store import (
+    group_by_parent,
+    reciprocal_rank_fusion,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    query = unicodedata.normalize("NFKD", query.lower())
+    query = "".join(c for c in query if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", query).split())
+
+
+class CachedSearch:
+    """
+    Redis cache in front of the searches of PublicationVectorStore.
+
+    The ranked passages of each query are keyed by the corpus generation, k and
+    the normalized query, and expire after `ttl` seconds; switching generation
+    invalidates every entry.
+    With `similarity_threshold`, a query missing from the cache can also be
+    served the results of a cached query whose embedding has at least that
+    cosine similarity. Query embeddings are computed by the store anyway, the
+    store's embedding cache makes the second call free. The embeddings of the
+    last `max_similar_entries` queries stored by this process are kept in
+    memory, per generation and k. This is off by default: close embeddings do
+    not make equivalent questions ("permis de conduire", "permis de
+    construire"), the threshold must be tuned on real queries first.
+    Passages are merged after the cache, so that a batch of queries can mix
+    hits and misses.
+
+    Redis errors are logged and fall back to the store, the cache is never
+    required to answer.
+    """
+
+    def __init__(
+        self,
+        store,
+        redis: Redis,
+        ttl: int = 24 * 3600,
+        similarity_threshold: Optional[float] = None,
+        max_similar_entries: int = 2000,
+        prefix: str = "search_cache",
+    ):
+        self.store = store
+        self.redis = redis
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_similar_entries = max_similar_entries
+        self.prefix = prefix
+        # namespace -> (query hashes, matrix of their normalized embeddings)
+        self._vectors: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._vectors_lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        self.store.refresh()
+        return self.store.generation
+
+    def _namespace(self, k: int) -> str:
+        return f"{self.prefix}:{self.generation}:{k}"
+
+    @staticmethod
+    def _dumps(docs: List[Document]) -> str:
+        return json.dumps(
+            [{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+            default=str,
+        )
+
+    @staticmethod
+    def _loads(data) -> List[Document]:
+        return [Document(**doc) for doc in json.loads(data)]
+
+    def _similar_key(self, namespace: str, vector: np.ndarray) -> Optional[str]:
+        """Hash of the cached query closest to vector, if similar enough."""
+        with self._vectors_lock:
+            hashes, matrix = self._vectors.get(namespace, ([], None))
+        if not hashes:
+            return None
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        return hashes[best]
+
+    def _remember_vector(self, namespace: str, query_hash: str, vector) -> None:
+        """Keep the embedding of a cached query, dropping older generations."""
+        generation = namespace.rsplit(":", 1)[0]
+        with self._vectors_lock:
+            for other in list(self._vectors):
+                if other.rsplit(":", 1)[0] != generation:
+                    del self._vectors[other]
+            hashes, matrix = self._vectors.get(namespace, ([], None))
+            hashes = (hashes + [query_hash])[-self.max_similar_entries :]
+            matrix = vector[None] if matrix is None else np.vstack([matrix, vector])
+            self._vectors[namespace] = (hashes, matrix[-self.max_similar_entries :])
+
+    def _query_vectors(self, queries: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.store.embeddings.embed_documents(queries), np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _lookup(self, namespace: str, queries: List[str]):
+        """Cached passages of queries, None for misses, with the miss vectors."""
+        hashes = [
+            hashlib.sha256(normalize_query(query).encode()).hexdigest()
+            for query in queries
+        ]
+        results = [self.redis.get(f"{namespace}:{h}") for h in hashes]
+        self.hits += sum(cached is not None for cached in results)
+
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        vectors = {}
+        if missing and self.similarity_threshold is not None:
+            # One embedding request for every query missing from the cache
+            missing_vectors = self._query_vectors([queries[i] for i in missing])
+            for i, vector in zip(missing, missing_vectors):
+                vectors[i] = vector
+                similar_hash = self._similar_key(namespace, vector)
+                if similar_hash is not None:
+                    results[i] = self.redis.get(f"{namespace}:{similar_hash}")
+                    self.similar_hits += results[i] is not None
+
+        results = [None if r is None else self._loads(r) for r in results]
+        return hashes, results, vectors
+
+    def _store(self, namespace, query_hash, passages, vector) -> None:
+        self.redis.set(f"{namespace}:{query_hash}", self._dumps(passages), ex=self.ttl)
+        if vector is not None:
+            self._remember_vector(namespace, query_hash, vector)
+
+    def _store_missing(self, namespace, hashes, results, vectors, missing) -> None:
+        try:
+            for i in missing:
+                self._store(namespace, hashes[i], results[i], vectors.get(i))
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable: {e}")
+
+    def _cached(self, queries: List[str], k: int):
+        """Look queries up, None when Redis is unavailable."""
+        try:
+            namespace = self._namespace(k)
+            return (namespace, *self._lookup(namespace, queries))
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable: {e}")
+            return None
+
+    def search_passages(self, queries: List[str], k: int = 5) -> List[List[Document]]:
+        """
+        Same as PublicationVectorStore.search_passages, only the queries missing
+        from Redis are sent to the store, in a single batch.
+        """
+        cached = self._cached(queries, k)
+        if cached is None:
+            return self.store.search_passages(queries, k=k)
+        namespace, hashes, results, vectors = cached
+
+        missing = [i for i, passages in enumerate(results) if passages is None]
+        self.misses += len(missing)
+        if missing:
+            found = self.store.search_passages([queries[i] for i in missing], k=k)
+            for i, passages in zip(missing, found):
+                results[i] = passages
+            self._store_missing(namespace, hashes, results, vectors, missing)
+        return results
+
+    async def asearch_passages(
+        self, queries: List[str], k: int = 5
+    ) -> List[List[Document]]:
+        """Async search_passages, Redis calls run in the default executor."""
+        cached = await asyncio.to_thread(self._cached, queries, k)
+        if cached is None:
+            return await self.store.asearch_passages(queries, k=k)
+        namespace, hashes, results, vectors = cached
+
+        missing = [i for i, passages in enumerate(results) if passages is None]
+        self.misses += len(missing)
+        if missing:
+            found = await self.store.asearch_passages(
+                [queries[i] for i in missing], k=k
+            )
+            for i, passages in zip(missing, found):
+                results[i] = passages
+            await asyncio.to_thread(
+                self._store_missing, namespace, hashes, results, vectors, missing
+            )
+        return results
+
+    def search(self, query: str, k: int = 5) -> List[Document]:
+        """Same as PublicationVectorStore.search, served from Redis if possible."""
+        return group_by_parent(self.search_passages([query], k)[0])
+
+    def search_many(
+        self, queries: List[str], k: int = 5, rrf_k: int = 60
+    ) -> List[Document]:
+        """Same as PublicationVectorStore.search_many, served from Redis if possible."""
+        return reciprocal_rank_fusion(self.search_passages(queries, k), rrf_k)
+
+    async def asearch_many(
+        self, queries: List[str], k: int = 5, rrf_k: int = 60
+    ) -> List[Document]:
+        """Async search_many."""
+        return reciprocal_rank_fusion(await self.asearch_passages(queries, k), rrf_k)
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = self.hits + self.similar_hits + self.misses
+        return (self.hits + self.similar_hits) / total if total else None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
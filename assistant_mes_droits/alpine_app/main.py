@@ -1,14 +1,19 @@
+import asyncio
+import json
 import logging
 import os
 import pathlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from langchain_core.messages import AIMessage, AnyMessage
 from pydantic import BaseModel
@@ -17,6 +22,7 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
 from assistant_mes_droits.agent.agent import AgentState, build_agent
+from assistant_mes_droits.agent.clients import checkpointer
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +33,8 @@ if dot_env_path.is_file():
     load_dotenv(dotenv_path=dot_env_path)
 
 REDIS_URI = os.environ.get("REDIS_URI")
+# Threads running the blocking calls of the async path (Redis, vector search)
+EXECUTOR_WORKERS = int(os.environ.get("EXECUTOR_WORKERS", 32))
 
 if not REDIS_URI:
     logger.error("REDIS_URI environment variable is not set.")
@@ -43,10 +51,14 @@ async def lifespan(app: FastAPI):
     """Run at startup
     Initialise the Client and add it to request.state
     """
+    executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS)
+    asyncio.get_running_loop().set_default_executor(executor)
     agent = build_agent()
 
     yield {"agent": agent}
 
+    executor.shutdown(wait=False)
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -60,25 +72,93 @@ app.add_middleware(
 
 
 class ChatRequest(BaseModel):
+    # With a thread_id, only the new messages are sent, the previous turns are
+    # kept server-side; without one, messages is the whole conversation.
     messages: List[AnyMessage]
+    thread_id: Optional[str] = None
+
+
+class ResetRequest(BaseModel):
+    thread_id: Optional[str] = None
+
+
+@asynccontextmanager
+async def thread_config(thread_id: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Graph config of a thread, a request without thread_id gets a one-off one."""
+    config = {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+    try:
+        yield config
+    finally:
+        if thread_id is None:
+            await checkpointer.adelete_thread(config["configurable"]["thread_id"])
 
 
-async def generate_response(agent, messages: List[AnyMessage]) -> AnyMessage:
+async def generate_response(
+    agent, messages: List[AnyMessage], thread_id: Optional[str] = None
+) -> AnyMessage:
     try:
         for message in messages:
             logger.info(f"Received message: {message}")
         state = AgentState(messages=messages)
-        result = agent.invoke(state)
+        async with thread_config(thread_id) as config:
+            result = await agent.ainvoke(state, config=config)
         return result["messages"][-1]
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         return AIMessage(content="Je ne peux pas répondre a votre question.")
 
 
-async def reset_conversation(request: Request) -> Dict[str, Any]:
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def stream_response(
+    agent, messages: List[AnyMessage], thread_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events of a graph run: a "node" event when each node finishes,
+    "token" events with the answer as generate_response produces it, then the
+    whole answer in a "message" event and a final "done" event.
+
+    In fast mode, the answer is a structured output whose streamed chunks hold
+    no text, it is sent in a single token when generate_response finishes.
+    """
+    answer = AIMessage(content="Je ne peux pas répondre a votre question.")
+    streamed = False
     try:
-        logger.info("Conversation reset requested.")
-        # Implement conversation reset logic here if needed.
+        for message in messages:
+            logger.info(f"Received message: {message}")
+        state = AgentState(messages=messages)
+        async with thread_config(thread_id) as config:
+            async for mode, chunk in agent.astream(
+                state,
+                config=config,
+                stream_mode=["updates", "messages"],
+            ):
+                if mode == "updates":
+                    for node, update in chunk.items():
+                        if node == "generate_response":
+                            answer = update["messages"][-1]
+                            if not streamed and answer.content:
+                                yield sse_event("token", {"content": answer.content})
+                        yield sse_event("node", {"node": node})
+                else:
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") == "generate_response":
+                        if message.content:
+                            streamed = True
+                            yield sse_event("token", {"content": message.content})
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+    yield sse_event("message", answer)
+    yield sse_event("done", {})
+
+
+async def reset_conversation(thread_id: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        logger.info(f"Conversation reset requested for thread {thread_id}.")
+        if thread_id:
+            await checkpointer.adelete_thread(thread_id)
         return {"status": "success"}
     except Exception as e:
         logger.error(f"Error resetting conversation: {e}")
@@ -111,13 +191,36 @@ async def root():
 @limiter.limit("10/minute")
 async def chat(request: Request, chat_request: ChatRequest):
     agent = request.state.agent
-    response = await generate_response(agent=agent, messages=chat_request.messages)
+    response = await generate_response(
+        agent=agent,
+        messages=chat_request.messages,
+        thread_id=chat_request.thread_id,
+    )
     return response
 
 
+@app.post("/chat/stream")
+@limiter.limit("10/minute")
+async def chat_stream(request: Request, chat_request: ChatRequest):
+    agent = request.state.agent
+    return StreamingResponse(
+        stream_response(
+            agent=agent,
+            messages=chat_request.messages,
+            thread_id=chat_request.thread_id,
+        ),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/reset")
-async def reset(request: Request) -> Dict[str, Any]:
-    return await reset_conversation(request)
+async def reset(
+    request: Request, reset_request: Optional[ResetRequest] = None
+) -> Dict[str, Any]:
+    thread_id = reset_request.thread_id if reset_request else None
+    return await reset_conversation(thread_id)
 
 
 @app.get("/robots.txt")
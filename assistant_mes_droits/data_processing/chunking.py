@@ -0,0 +1,35 @@
+from typing import List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from assistant_mes_droits.data_processing.models import PublicationModel
+
+# Prefer splitting between markdown sections, then paragraphs, then lines
+SEPARATORS = ["\n## ", "\n\n", "\n", " ", ""]
+
+
+def chunk_markdown(
+    markdown: str, chunk_size: int = 2000, chunk_overlap: int = 200
+) -> List[str]:
+    """Split markdown on sections and paragraphs into overlapping chunks"""
+    splitter = RecursiveCharacterTextSplitter(
+        separators=SEPARATORS,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        keep_separator="start",
+        strip_whitespace=True,
+    )
+    return splitter.split_text(markdown)
+
+
+def chunk_publication(
+    pub: PublicationModel, chunk_size: int = 2000, chunk_overlap: int = 200
+) -> List[str]:
+    """
+    Split a publication's markdown into passages, repeating the title on every
+    passage after the first so each one can be embedded on its own
+    """
+    chunks = chunk_markdown(pub.to_markdown(), chunk_size, chunk_overlap)
+    if not pub.title:
+        return chunks
+    return chunks[:1] + [f"# {pub.title}\n\n{chunk}" for chunk in chunks[1:]]
@@ -1,7 +1,109 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
 import requests
+from pydantic import BaseModel
+
+from assistant_mes_droits.logger import logger
+
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_CACHE_DIR = Path(
+    os.environ.get(
+        "DOWNLOAD_CACHE_DIR", Path.home() / ".cache" / "assistant_mes_droits"
+    )
+)
+
+
+class CachedArchive(BaseModel):
+    url: str
+    path: str
+    sha256: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Whether the content differs from the previously cached archive
+    changed: bool = True
+
+
+def file_sha256(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_cached_archive(meta_path: Path) -> Optional[CachedArchive]:
+    """Return the cache entry if its archive is present and matches its checksum."""
+    if not meta_path.is_file():
+        return None
+    cached = CachedArchive.model_validate_json(meta_path.read_text())
+    archive_path = Path(cached.path)
+    if not archive_path.is_file() or file_sha256(archive_path) != cached.sha256:
+        logger.warning(f"Discarding corrupted cache entry for {cached.url}")
+        return None
+    return cached
+
+
+def fetch_zip(
+    url: str,
+    cache_dir: Optional[Path] = None,
+    offline: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> CachedArchive:
+    """
+    Download a zip archive into a local cache keyed by URL.
+
+    The stored ETag/Last-Modified are sent as conditional headers, so an
+    unchanged archive is answered with a 304 and served from the cache with
+    `changed=False`. A 200 whose checksum matches the cached one is also
+    reported as unchanged. In offline mode, the cached archive is returned
+    without any request.
+    """
+    cache_dir = Path(cache_dir or DOWNLOAD_CACHE_DIR)
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+    archive_path = cache_dir / f"{key}.zip"
+    meta_path = cache_dir / f"{key}.json"
+    cached = _load_cached_archive(meta_path)
+
+    if offline:
+        if cached is None:
+            raise FileNotFoundError(f"No cached archive for {url} in {cache_dir}")
+        logger.info(f"Offline mode, reusing cached archive {cached.path}")
+        return cached.model_copy(update={"changed": False})
+
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    part_path = archive_path.with_suffix(".part")
+    with requests.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304 and cached is not None:
+            logger.info(f"{url} not modified, using cached archive")
+            return cached.model_copy(update={"changed": False})
+        response.raise_for_status()
 
+        digest = hashlib.sha256()
+        with open(part_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
 
-def download_zip(url: str) -> bytes:
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.content
+    os.replace(part_path, archive_path)
+    archive = CachedArchive(
+        url=url,
+        path=str(archive_path),
+        sha256=digest.hexdigest(),
+        etag=etag,
+        last_modified=last_modified,
+    )
+    archive.changed = cached is None or cached.sha256 != archive.sha256
+    meta_path.write_text(archive.model_dump_json())
+    return archive
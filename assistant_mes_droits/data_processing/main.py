@@ -1,12 +1,30 @@
-from assistant_mes_droits.data_processing.download import download_zip
+from typing import Iterator, Optional
+
+from assistant_mes_droits.data_processing.download import fetch_zip
+from assistant_mes_droits.data_processing.models import PublicationModel
 from assistant_mes_droits.data_processing.parse import parse_zip_content
+from assistant_mes_droits.data_processing.snapshot import archive_snapshot
+
+VOSDROITS_URL = (
+    "https://lecomarquage.service-public.fr/vdd/3.4/part/zip/vosdroits-latest.zip"
+)
+
+
+def process_publications(workers: Optional[int] = 1, offline: bool = False):
+    archive = fetch_zip(VOSDROITS_URL, offline=offline)
+    return parse_zip_content(archive.path, workers=workers)
 
 
-def process_publications():
-    zip_data = download_zip(
-        "https://lecomarquage.service-public.fr/vdd/3.4/part/zip/vosdroits-latest.zip"
-    )
-    return parse_zip_content(zip_data)
+def iter_publications(
+    url: str = VOSDROITS_URL, offline: bool = False
+) -> Iterator[PublicationModel]:
+    """
+    Yield publications one by one from the snapshot of the cached archive,
+    which is only parsed again when its content changed
+    """
+    archive = fetch_zip(url, offline=offline)
+    with archive_snapshot(archive) as snapshot:
+        yield from snapshot
 
 
 if __name__ == "__main__":
@@ -1,23 +1,30 @@
+import os
+import tempfile
 import xml.etree.ElementTree as ET
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
-from typing import List
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Union
 
 from assistant_mes_droits.data_processing.models import PublicationModel
 
+DC_TITLE = "{http://purl.org/dc/elements/1.1/}title"
+MAX_MEMBER_SIZE = 0.5 * 1024 * 1024
+
 
 # Clean text with \xa0 removal
 def clean_text(text: str) -> str:
     return text.replace("\xa0", " ").strip()
 
 
-def parse_xml(content: str) -> PublicationModel:
+def parse_xml(content: Union[str, bytes]) -> PublicationModel:
     """Parse single XML file into flattened model"""
     root = ET.fromstring(content)
     pub = PublicationModel(
         id=root.get("ID"),
         sp_url=root.get("spUrl"),
-        title=root.findtext(".//{http://purl.org/dc/elements/1.1/}title"),
+        title=root.findtext(f".//{DC_TITLE}"),
     )
 
     # Extract paragraphs
@@ -34,11 +41,107 @@ def parse_xml(content: str) -> PublicationModel:
     return pub
 
 
-def parse_zip_content(zip_data: bytes) -> List[PublicationModel]:
-    """Process zip file containing multiple XMLs, skipping files >0.5MB"""
-    with zipfile.ZipFile(BytesIO(zip_data)) as zf:
-        return [
-            parse_xml(zf.read(f).decode("utf-8"))
-            for f in zf.namelist()
-            if f.endswith(".xml") and zf.getinfo(f).file_size <= 0.5 * 1024 * 1024
-        ]
+def parse_xml_stream(source: BinaryIO) -> PublicationModel:
+    """Parse single XML file incrementally, producing the same model as parse_xml"""
+    pub = PublicationModel()
+    root = None
+    open_lists = []
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+                pub.id = elem.get("ID")
+                pub.sp_url = elem.get("spUrl")
+            elif elem.tag == "Liste":
+                # Reserve the slot now so nested lists keep document order
+                pub.lists.append([])
+                open_lists.append(len(pub.lists) - 1)
+            continue
+
+        if elem.tag == DC_TITLE and pub.title is None:
+            pub.title = elem.text or ""
+        elif elem.tag == "Paragraphe":
+            if elem.text:
+                pub.paragraphs.append(clean_text(elem.text))
+        elif elem.tag == "Liste":
+            pub.lists[open_lists.pop()] = [
+                clean_text(i.text) for i in elem.findall("Item") if i.text
+            ]
+            # Items of a closed list are no longer needed
+            elem.clear()
+
+    return pub
+
+
+def is_publication_member(info: zipfile.ZipInfo) -> bool:
+    return info.filename.endswith(".xml") and info.file_size <= MAX_MEMBER_SIZE
+
+
+def parse_zip_content(
+    zip_file: Union[bytes, str, os.PathLike],
+    workers: Optional[int] = 1,
+    chunk_size: int = 200,
+) -> List[PublicationModel]:
+    """
+    Process zip file (raw bytes or a path) containing multiple XMLs, skipping
+    files >0.5MB
+
+    Members are parsed from their raw bytes, letting the XML parser handle the
+    declared encoding. With `workers` > 1 (or None for one per CPU), members are
+    sharded in chunks of `chunk_size` across a process pool; results keep the
+    archive order either way. Workers open the archive from disk, raw bytes
+    are spilled to a temporary file first.
+    """
+    source = BytesIO(zip_file) if isinstance(zip_file, bytes) else zip_file
+    with zipfile.ZipFile(source) as zf:
+        names = [info.filename for info in zf.infolist() if is_publication_member(info)]
+
+        if workers == 1:
+            return [parse_xml(zf.read(name)) for name in names]
+
+    if isinstance(zip_file, bytes):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "archive.zip"
+            path.write_bytes(zip_file)
+            return _parse_in_pool(path, names, workers, chunk_size)
+    return _parse_in_pool(zip_file, names, workers, chunk_size)
+
+
+def _parse_in_pool(
+    path: Union[str, os.PathLike],
+    names: List[str],
+    workers: Optional[int],
+    chunk_size: int,
+) -> List[PublicationModel]:
+    chunks = [names[i : i + chunk_size] for i in range(0, len(names), chunk_size)]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(os.fspath(path),)
+    ) as executor:
+        return [pub for pubs in executor.map(_parse_members, chunks) for pub in pubs]
+
+
+# Archive opened once per worker process by the pool initializer
+_worker_zip: Optional[zipfile.ZipFile] = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_zip
+    _worker_zip = zipfile.ZipFile(path)
+
+
+def _parse_members(names: List[str]) -> List[PublicationModel]:
+    return [parse_xml(_worker_zip.read(name)) for name in names]
+
+
+def iter_zip_content(zip_file: Union[str, BinaryIO]) -> Iterator[PublicationModel]:
+    """
+    Lazily yield publications from a zip file path or file object, one member at a
+    time, skipping files >0.5MB
+    """
+    with zipfile.ZipFile(zip_file) as zf:
+        for info in zf.infolist():
+            if not is_publication_member(info):
+                continue
+            with zf.open(info) as member:
+                yield parse_xml_stream(member)
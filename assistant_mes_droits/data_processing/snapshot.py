@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence, Union
+
+from assistant_mes_droits.data_processing.download import CachedArchive
+from assistant_mes_droits.data_processing.models import PublicationModel
+from assistant_mes_droits.data_processing.parse import iter_zip_content
+from assistant_mes_droits.logger import logger
+
+# Layout: header | JSON records back to back | (count + 1) little-endian uint64
+# offsets of each record relative to the start of the file.
+MAGIC = b"MDSNAP01"
+HEADER = struct.Struct("<8sQQ")  # magic, record count, offset table position
+OFFSET = struct.Struct("<Q")
+
+
+def save_snapshot(publications: Iterable[PublicationModel], path: Union[str, Path]):
+    """
+    Write publications to a length-prefixed binary snapshot.
+
+    Records are streamed to disk as they come, so `publications` can be a
+    generator. The file is written next to `path` and moved in place once
+    complete, so readers never see a partial snapshot.
+    """
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    offsets = []
+
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        for pub in publications:
+            offsets.append(f.tell())
+            f.write(pub.model_dump_json().encode("utf-8"))
+        offsets.append(f.tell())
+
+        table_offset = f.tell()
+        f.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(offsets) - 1, table_offset))
+
+    os.replace(tmp_path, path)
+
+
+class PublicationSnapshot(Sequence[PublicationModel]):
+    """Memory-mapped snapshot, records are only decoded when accessed."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, self._table_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a publication snapshot")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _offset(self, i: int) -> int:
+        return OFFSET.unpack_from(self._mmap, self._table_offset + i * OFFSET.size)[0]
+
+    def raw(self, i: int) -> bytes:
+        """Return the undecoded JSON record at position i."""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("snapshot index out of range")
+        return self._mmap[self._offset(i) : self._offset(i + 1)]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        return PublicationModel.model_validate_json(self.raw(i))
+
+    def __iter__(self) -> Iterator[PublicationModel]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_snapshot(path: Union[str, Path]) -> PublicationSnapshot:
+    """Open a snapshot written by save_snapshot without decoding any record."""
+    return PublicationSnapshot(path)
+
+
+def archive_snapshot(archive: CachedArchive) -> PublicationSnapshot:
+    """
+    Open the snapshot of a cached archive, parsing the archive only when its
+    content changed.
+
+    Snapshots are stored next to the archive and keyed by its sha256, so an
+    unchanged archive is never parsed twice. Snapshots of previous contents
+    are removed once the new one is written.
+    """
+    archive_path = Path(archive.path)
+    path = archive_path.with_name(f"{archive_path.stem}.{archive.sha256[:16]}.snapshot")
+    if not path.is_file():
+        logger.info(f"Parsing {archive_path} into {path}")
+        save_snapshot(iter_zip_content(archive_path), path)
+        for stale in archive_path.parent.glob(f"{archive_path.stem}.*.snapshot"):
+            if stale != path:
+                stale.unlink()
+    return load_snapshot(path)
@@ -1,28 +1,169 @@
+import asyncio
+import random
+import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import Dict, List
 
 from langchain_core.embeddings import Embeddings
 
-from assistant_mes_droits.vector_store.clients import client
+from assistant_mes_droits.logger import logger
+from assistant_mes_droits.vector_store.clients import client as global_client
+from assistant_mes_droits.vector_store.rate_limit import AIMDLimiter, TokenBucket
+
+MAX_TEXT_LENGTH = 10000
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    return getattr(error, "code", None) in RETRYABLE_CODES
 
 
 class GeminiAPIEmbeddings(Embeddings):
-    def __init__(self, model: str = "text-embedding-004"):
+    def __init__(
+        self,
+        model: str = "text-embedding-004",
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        requests_per_second: float = 25.0,
+        max_async_concurrency: int = 32,
+        target_latency: float = 5.0,
+        max_retries: int = 8,
+        retry_base_delay: float = 1.0,
+        client=global_client,
+    ):
+        """
+        Args:
+            model: Gemini embedding model
+            batch_size: Number of texts sent in a single embed_content request
+            max_concurrency: Number of batch requests in flight at once, also the
+                starting concurrency of the async methods
+            requests_per_second: Token bucket rate of the async methods
+            max_async_concurrency: Upper bound of the adaptive async concurrency
+            target_latency: Async responses slower than this reduce concurrency
+            max_retries: Retries allowed per text in the async methods
+            retry_base_delay: Base of the exponential backoff between retries
+            client: google-genai client
+        """
         self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.client = client
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.concurrency = AIMDLimiter(
+            initial_limit=max_concurrency,
+            max_limit=max_async_concurrency,
+            target_latency=target_latency,
+        )
+
+    @staticmethod
+    def _prepare(text: str) -> str:
+        # Empty texts are rejected by the API, embed a random token instead
+        return str(text)[:MAX_TEXT_LENGTH] if text else uuid.uuid4().hex
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.models.embed_content(model=self.model, contents=texts)
+        return [embedding.values for embedding in response.embeddings]
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed search docs."""
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            return list(executor.map(self.embed_query, texts))
+        """Embed search docs, batch_size texts per request, in input order."""
+        contents = [self._prepare(text) for text in texts]
+        batches = [
+            contents[i : i + self.batch_size]
+            for i in range(0, len(contents), self.batch_size)
+        ]
+        if len(batches) <= 1:
+            return [v for batch in batches for v in self._embed_batch(batch)]
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            # map yields results in submission order, whatever finishes first
+            return [
+                v
+                for vectors in executor.map(self._embed_batch, batches)
+                for v in vectors
+            ]
 
     def embed_query(self, text: str) -> List[float]:
         """Embed query text."""
-        response = client.models.embed_content(
-            model=self.model,
-            contents=str(text)[:10000] if text else uuid.uuid4().hex,
-        )
-        return response.embeddings[0].values
+        return self._embed_batch([self._prepare(text)])[0]
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Counters of the async path, with the current concurrency limit."""
+        return {
+            **self.concurrency.counters,
+            "concurrency_limit": self.concurrency.limit,
+            "in_flight": self.concurrency.in_flight,
+        }
+
+    async def _aembed_request(self, texts: List[str]) -> List[List[float]]:
+        await self.rate_limiter.acquire()
+        async with self.concurrency.slot():
+            self.concurrency.counters["requests"] += 1
+            start = time.monotonic()
+            try:
+                response = await self.client.aio.models.embed_content(
+                    model=self.model, contents=texts
+                )
+            except Exception as e:
+                self.concurrency.counters["errors"] += 1
+                if getattr(e, "code", None) == 429:
+                    self.concurrency.on_throttle()
+                raise
+            self.concurrency.on_success(time.monotonic() - start)
+        return [embedding.values for embedding in response.embeddings]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed search docs asynchronously, paced by the token bucket and the
+        adaptive concurrency limit.
+
+        Each text has its own retry budget: the texts of a failed request are
+        put back in the queue and re-batched with the other pending texts,
+        while texts from successful requests are never sent again.
+        """
+        contents = [self._prepare(text) for text in texts]
+        results: List[List[float]] = [None] * len(contents)
+        attempts = [0] * len(contents)
+        pending = list(range(len(contents)))
+
+        while pending:
+            batches = [
+                pending[i : i + self.batch_size]
+                for i in range(0, len(pending), self.batch_size)
+            ]
+            outcomes = await asyncio.gather(
+                *(self._aembed_request([contents[j] for j in b]) for b in batches),
+                return_exceptions=True,
+            )
+            pending = []
+            for batch, outcome in zip(batches, outcomes):
+                if not isinstance(outcome, BaseException):
+                    for j, vector in zip(batch, outcome):
+                        results[j] = vector
+                    continue
+                if not is_retryable(outcome):
+                    raise outcome
+                for j in batch:
+                    attempts[j] += 1
+                    if attempts[j] > self.max_retries:
+                        raise outcome
+                pending.extend(batch)
+                self.concurrency.counters["retried_items"] += len(batch)
+
+            if pending:
+                attempt = max(attempts[j] for j in pending)
+                delay = min(60.0, self.retry_base_delay * 2 ** (attempt - 1))
+                logger.info(f"Retrying {len(pending)} texts in {delay:.1f}s")
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        return results
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed query text asynchronously."""
+        return (await self.aembed_documents([text]))[0]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = Path(
+    os.environ.get(
+        "EMBEDDING_CACHE_PATH",
+        Path.home() / ".cache" / "assistant_mes_droits" / "embeddings.sqlite",
+    )
+)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent SQLite cache in front of another Embeddings instance.
+
+    Entries are keyed by (model, sha256 of the text) and store the vector as
+    packed float32. When the cache holds more than `max_entries` vectors, the
+    least recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: Union[str, Path] = EMBEDDING_CACHE_PATH,
+        max_entries: int = 100_000,
+    ):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_last_used
+                ON embeddings (last_used);
+            """
+        )
+        self._clock, self._count = self._conn.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    @property
+    def model(self) -> str:
+        return getattr(self.embeddings, "model", type(self.embeddings).__name__)
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i : i + 500]
+            rows = self._conn.execute(
+                "SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                [self.model, *chunk],
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+        if found:
+            tick = self._tick()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(tick, self.model, key) for key in found],
+            )
+        return found
+
+    def _put_many(self, entries: Dict[str, List[float]]) -> None:
+        tick = self._tick()
+        # The entry count is kept in memory, a COUNT(*) scans the whole table.
+        # Texts embedded concurrently by another caller are already stored
+        # with the same vector, so they are skipped and not counted twice.
+        self._count += self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)",
+            [
+                (self.model, key, array("f", vector).tobytes(), tick)
+                for key, vector in entries.items()
+            ],
+        ).rowcount
+        excess = self._count - self.max_entries
+        if excess > 0:
+            self._count -= self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            ).rowcount
+
+    def _lookup(self, texts: List[str]):
+        """Return the text keys, cached vectors and texts left to embed."""
+        keys = [text_hash(text) if text else None for text in texts]
+        with self._lock:
+            cached = self._get_many(sorted({key for key in keys if key}))
+            self._conn.commit()
+            hits = sum(1 for key in keys if key in cached)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        # Empty texts get a random embedding downstream, they are never cached
+        to_embed = {}
+        for text, key in zip(texts, keys):
+            if key and key not in cached:
+                to_embed.setdefault(key, text)
+        return keys, cached, to_embed
+
+    def _merge(self, keys, cached, to_embed, vectors) -> List[List[float]]:
+        """Store new vectors and reassemble all of them in input order."""
+        new_vectors = dict(zip(to_embed, vectors))
+        empty_vectors = iter(vectors[len(to_embed) :])
+        if new_vectors:
+            with self._lock:
+                self._put_many(new_vectors)
+                self._conn.commit()
+
+        return [
+            cached[key]
+            if key in cached
+            else new_vectors[key]
+            if key
+            else next(empty_vectors)
+            for key in keys
+        ]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search docs, only sending cache misses to the wrapped model."""
+        keys, cached, to_embed = self._lookup(texts)
+        missing = list(to_embed.values()) + [""] * keys.count(None)
+        vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._merge(keys, cached, to_embed, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text, served from the cache when possible."""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Async embed_documents, cache misses go to the wrapped async method.
+        The blocking SQLite reads and writes run in the default executor.
+        """
+        keys, cached, to_embed = await asyncio.to_thread(self._lookup, texts)
+        missing = list(to_embed.values()) + [""] * keys.count(None)
+        vectors = await self.embeddings.aembed_documents(missing) if missing else []
+        return await asyncio.to_thread(self._merge, keys, cached, to_embed, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async embed_query, served from the cache when possible."""
+        return (await self.aembed_documents([text]))[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+    def close(self):
+        self._conn.close()
@@ -1,14 +1,43 @@
+import argparse
 import time
 
-from assistant_mes_droits.data_processing.main import process_publications
+from assistant_mes_droits.data_processing.download import fetch_zip
+from assistant_mes_droits.data_processing.main import VOSDROITS_URL
+from assistant_mes_droits.data_processing.snapshot import archive_snapshot
+from assistant_mes_droits.logger import logger
 from assistant_mes_droits.vector_store.vector_store import PublicationVectorStore
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--offline", action="store_true", help="Reuse the cached archive"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Re-index even if already indexed"
+    )
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Rebuild everything as a new generation instead of updating in place",
+    )
+    args = parser.parse_args()
+
+    archive = fetch_zip(VOSDROITS_URL, offline=args.offline)
     store = PublicationVectorStore()
 
-    publications = process_publications()
+    # Only recorded once indexing succeeded, an interrupted run is redone
+    if store.indexed_source() == archive.sha256 and not args.force:
+        logger.info("Archive already indexed, skipping indexing")
+        raise SystemExit(0)
 
-    store.add_publications(publications)
+    # An unchanged archive is read back from its snapshot instead of parsed
+    with archive_snapshot(archive) as publications:
+        if args.reindex:
+            store.reindex(publications, source=archive.sha256)
+        else:
+            store.add_publications(
+                publications, incremental=True, source=archive.sha256
+            )
 
     time.sleep(30)
 
@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted file index over the rows of a normalized embedding matrix.
+
+    Rows are clustered with spherical k-means into `n_lists` lists; a query only
+    scores the rows of its `n_probe` closest lists. Raising n_probe trades
+    latency for recall, n_probe == n_lists is an exact search.
+
+    The index only stores one list id per row, the caller keeps the vectors and
+    reports every row it writes (`assign_rows`) or moves (`move_row`).
+    """
+
+    def __init__(
+        self,
+        n_lists: int = 256,
+        n_probe: int = 16,
+        n_iter: int = 10,
+        train_sample: int = 64,
+        seed: int = 0,
+    ):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.train_sample = train_sample
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._sorted_rows: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def reset(self) -> None:
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._sorted_rows = None
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit the centroids on (a sample of) vectors and assign every row."""
+        rng = np.random.default_rng(self.seed)
+        n_lists = min(self.n_lists, len(vectors))
+        n_sample = min(len(vectors), n_lists * self.train_sample)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), n_sample, False))])
+        centroids = sample[rng.choice(n_sample, n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.flatnonzero(np.bincount(labels, minlength=n_lists) == 0)
+            # Reseed empty lists on random sample points
+            sums[empty] = sample[rng.choice(n_sample, len(empty))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.empty(len(vectors), dtype=np.int32)
+        self.assign_rows(np.arange(len(vectors)), vectors)
+
+    def _nearest_lists(self, vectors: np.ndarray, batch_size: int = 8192):
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for i in range(0, len(vectors), batch_size):
+            scores = np.asarray(vectors[i : i + batch_size]) @ self.centroids.T
+            labels[i : i + batch_size] = np.argmax(scores, axis=1)
+        return labels
+
+    def reserve(self, capacity: int) -> None:
+        if capacity > len(self.assignments):
+            assignments = np.empty(capacity, dtype=np.int32)
+            assignments[: len(self.assignments)] = self.assignments
+            self.assignments = assignments
+
+    def assign_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Record the list of rows that were inserted or overwritten."""
+        if not self.trained or len(rows) == 0:
+            return
+        self.reserve(int(np.max(rows)) + 1)
+        self.assignments[rows] = self._nearest_lists(vectors)
+        self._sorted_rows = None
+
+    def move_row(self, src: int, dst: int) -> None:
+        """Record that the vector of row src now lives in row dst."""
+        if self.trained:
+            self.assignments[dst] = self.assignments[src]
+            self._sorted_rows = None
+
+    def candidates(self, query: np.ndarray, size: int) -> np.ndarray:
+        """Rows, among the first `size`, of the lists closest to the query."""
+        if self._sorted_rows is None or len(self._sorted_rows) != size:
+            # Group rows by list once, reused until the next write
+            assignments = self.assignments[:size]
+            self._sorted_rows = np.argsort(assignments, kind="stable")
+            self._offsets = np.searchsorted(
+                assignments[self._sorted_rows], np.arange(len(self.centroids) + 1)
+            )
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        return np.concatenate(
+            [self._sorted_rows[self._offsets[p] : self._offsets[p + 1]] for p in probes]
+        )
+
+    def save(self, path: Union[str, Path], size: int) -> None:
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                assignments=self.assignments[:size],
+            )
+
+    def load(self, path: Union[str, Path]) -> None:
+        with np.load(path) as data:
+            self.centroids = data["centroids"]
+            self.assignments = data["assignments"].copy()
+        self._sorted_rows = None
@@ -0,0 +1,425 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from assistant_mes_droits.vector_store.ivf_index import IVFIndex
+from assistant_mes_droits.vector_store.quantization import VectorQuantizer
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.json"
+IVF_FILE = "ivf.npz"
+CODES_FILE = "codes.npz"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store keeping normalized embeddings in one contiguous
+    float32 matrix, with texts and metadata in a side table.
+
+    The matrix is persisted as a .npy file and memory-mapped read-only when
+    loaded; it is copied into a growable buffer on the first write. Scores are
+    cosine similarities mapped to [0, 1] like Atlas Vector Search.
+
+    Search is exact by default. With index="ivf", an IVFIndex is trained on the
+    stored vectors once there are at least `min_train_size` of them, kept up to
+    date on every write and persisted with the matrix; searches then only score
+    the rows of the `n_probe` lists closest to the query.
+
+    With `quantization` ("float16" or "int8") and/or `reduced_dimensions`, a
+    compact copy of the vectors is kept in memory and scanned instead of the
+    matrix; the `rescore_factor * k` best candidates are then rescored exactly
+    with their full vectors. A process that only searches a persisted store
+    keeps the float32 matrix memory-mapped and reads just the rescored rows.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        embedding: Embeddings,
+        dimensions: int = 768,
+        index: str = "exact",
+        n_lists: int = 256,
+        n_probe: int = 16,
+        min_train_size: Optional[int] = None,
+        quantization: Optional[str] = None,
+        reduced_dimensions: Optional[int] = None,
+        projection: str = "truncate",
+        rescore_factor: int = 4,
+    ):
+        if index not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index type: {index}")
+        self.path = Path(path)
+        self.ivf = (
+            IVFIndex(n_lists=n_lists, n_probe=n_probe) if index == "ivf" else None
+        )
+        self.min_train_size = min_train_size or 8 * n_lists
+        self.quantizer = (
+            VectorQuantizer(
+                quantization or "float16",
+                dimensions=reduced_dimensions,
+                projection=projection,
+            )
+            if quantization or reduced_dimensions
+            else None
+        )
+        self.rescore_factor = rescore_factor
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._embedding = embedding
+        self.dimensions = dimensions
+        self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._loaded_mtime = None
+        self.load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._matrix[: self._size]
+
+    # Persistence
+
+    def load(self) -> None:
+        """Memory-map the persisted matrix and read the side table, if any."""
+        vectors_path = self.path / VECTORS_FILE
+        metadata_path = self.path / METADATA_FILE
+        if not metadata_path.is_file():
+            return
+        with open(metadata_path) as f:
+            table = json.load(f)
+        self._matrix = np.load(vectors_path, mmap_mode="r")
+        self._size = len(table["ids"])
+        self._ids = table["ids"]
+        self._texts = table["texts"]
+        self._metadatas = table["metadatas"]
+        self._rows = {_id: row for row, _id in enumerate(self._ids)}
+        if self.ivf is not None:
+            self.ivf.reset()
+            if (self.path / IVF_FILE).is_file():
+                self.ivf.load(self.path / IVF_FILE)
+            if len(self.ivf.assignments) != self._size:
+                # Written by an interrupted persist, retrain on the next search
+                self.ivf.reset()
+        if self.quantizer is not None:
+            self.quantizer.reset()
+            self._codes = self._scales = None
+            if (self.path / CODES_FILE).is_file():
+                self._codes, self._scales = self.quantizer.load(self.path / CODES_FILE)
+            if self._codes is None or len(self._codes) != self._size:
+                self.quantizer.reset()
+                self._codes = self._scales = None
+        self._loaded_mtime = metadata_path.stat().st_mtime_ns
+
+    def refresh(self) -> bool:
+        """Reload from disk if another process persisted a newer version."""
+        metadata_path = self.path / METADATA_FILE
+        if (
+            metadata_path.is_file()
+            and metadata_path.stat().st_mtime_ns != self._loaded_mtime
+        ):
+            self.load()
+            return True
+        return False
+
+    def persist(self) -> None:
+        """Atomically write the matrix and the side table to disk."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        vectors_tmp = self.path / f"{VECTORS_FILE}.tmp"
+        metadata_tmp = self.path / f"{METADATA_FILE}.tmp"
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+        with open(metadata_tmp, "w") as f:
+            json.dump(
+                {"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas},
+                f,
+                default=str,
+            )
+        if self.ivf is not None and self.ivf.trained:
+            ivf_tmp = self.path / f"{IVF_FILE}.tmp"
+            self.ivf.save(ivf_tmp, self._size)
+            os.replace(ivf_tmp, self.path / IVF_FILE)
+        if self._codes is not None:
+            codes_tmp = self.path / f"{CODES_FILE}.tmp"
+            self.quantizer.save(
+                codes_tmp, self._codes[: self._size], self._scales[: self._size]
+            )
+            os.replace(codes_tmp, self.path / CODES_FILE)
+        os.replace(vectors_tmp, self.path / VECTORS_FILE)
+        os.replace(metadata_tmp, self.path / METADATA_FILE)
+        self._loaded_mtime = (self.path / METADATA_FILE).stat().st_mtime_ns
+
+    def drop(self) -> None:
+        """Delete the persisted files, and the directory when left empty."""
+        for name in (VECTORS_FILE, METADATA_FILE, IVF_FILE, CODES_FILE):
+            (self.path / name).unlink(missing_ok=True)
+        if self.path.is_dir() and not any(self.path.iterdir()):
+            self.path.rmdir()
+        self.delete()
+
+    # Writes
+
+    def _reserve(self, n_rows: int) -> None:
+        """Make room for n_rows, copying out of the read-only memory map."""
+        needed = self._size + n_rows
+        if needed <= len(self._matrix) and self._matrix.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._matrix), 1024)
+        matrix = np.empty((capacity, self.dimensions), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+        if self.ivf is not None:
+            self.ivf.reserve(capacity)
+        if self._codes is not None:
+            codes = np.empty((capacity, self._codes.shape[1]), dtype=self._codes.dtype)
+            codes[: self._size] = self._codes[: self._size]
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[: self._size] = self._scales[: self._size]
+            self._codes, self._scales = codes, scales
+
+    def upsert(
+        self,
+        ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+    ) -> List[str]:
+        """Insert or replace documents with precomputed embeddings."""
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32))
+        self._reserve(len(ids))
+        written = []
+        for _id, text, vector, metadata in zip(ids, texts, vectors, metadatas):
+            row = self._rows.get(_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._rows[_id] = row
+                self._ids.append(_id)
+                self._texts.append(text)
+                self._metadatas.append(dict(metadata))
+            else:
+                self._texts[row] = text
+                self._metadatas[row] = dict(metadata)
+            self._matrix[row] = vector
+            written.append(row)
+        rows = np.asarray(written, dtype=np.int64)
+        if self.ivf is not None:
+            self.ivf.assign_rows(rows, self._matrix[rows])
+        if self._codes is not None and len(rows):
+            self._codes[rows], self._scales[rows] = self.quantizer.encode(
+                self._matrix[rows]
+            )
+        return list(ids)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            ids = [str(uuid4()) for _ in texts]
+        embeddings = self._embedding.embed_documents(texts)
+        return self.upsert(list(ids), texts, embeddings, metadatas)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete documents by ID, all documents when ids is None."""
+        if ids is None:
+            ids = list(self._ids)
+        to_delete = [_id for _id in ids if _id in self._rows]
+        if to_delete:
+            self._reserve(0)
+        for _id in to_delete:
+            # Move the last row into the freed slot to keep the matrix contiguous
+            row = self._rows.pop(_id)
+            last = self._size - 1
+            if row != last:
+                last_id = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = last_id
+                self._texts[row] = self._texts[last]
+                self._metadatas[row] = self._metadatas[last]
+                self._rows[last_id] = row
+                if self.ivf is not None:
+                    self.ivf.move_row(last, row)
+                if self._codes is not None:
+                    self._codes[row] = self._codes[last]
+                    self._scales[row] = self._scales[last]
+            self._ids.pop()
+            self._texts.pop()
+            self._metadatas.pop()
+            self._size -= 1
+        return True
+
+    # Reads
+
+    def iter_metadata(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return zip(list(self._ids), list(self._metadatas))
+
+    def _document(self, row: int) -> Document:
+        return Document(
+            page_content=self._texts[row],
+            metadata={"_id": self._ids[row], **self._metadatas[row]},
+        )
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return [self._document(self._rows[_id]) for _id in ids if _id in self._rows]
+
+    def train_index(self) -> None:
+        """(Re)build the IVF lists from the stored vectors."""
+        self.ivf.train(self.vectors)
+
+    def _use_ivf(self) -> bool:
+        if self.ivf is None:
+            return False
+        if not self.ivf.trained and self._size >= self.min_train_size:
+            self.train_index()
+        return self.ivf.trained
+
+    def encode_vectors(self) -> None:
+        """(Re)build the compact copy of the stored vectors."""
+        self.quantizer.reset()
+        self.quantizer.fit(self.vectors)
+        codes, scales = self.quantizer.encode(self.vectors)
+        # Same capacity as the matrix, so that writes can fill the spare rows
+        self._codes = np.empty((len(self._matrix), codes.shape[1]), codes.dtype)
+        self._scales = np.empty(len(self._matrix), dtype=np.float32)
+        self._codes[: self._size], self._scales[: self._size] = codes, scales
+
+    def _use_codes(self) -> bool:
+        if self.quantizer is None or self._size == 0:
+            return False
+        if self._codes is None:
+            self.encode_vectors()
+        return True
+
+    def _rescore(
+        self, query: np.ndarray, candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top k among candidates, reading only their rows of the matrix."""
+        candidates = np.sort(candidates)
+        scores = np.asarray(self._matrix[candidates]) @ query
+        top = top_k_indices(scores, k)
+        return candidates[top], scores[top]
+
+    def _search_rows(
+        self, query: np.ndarray, rows: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k (rows, scores) for one query among the given rows."""
+        if not self._use_codes():
+            return self._rescore(query, rows, k)
+        approx = self.quantizer.scores(self._codes[rows], self._scales[rows], query)
+        return self._rescore(
+            query, rows[top_k_indices(approx, self.rescore_factor * k)], k
+        )
+
+    def top_k(
+        self, query_vectors: np.ndarray, k: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return the (rows, cosine scores) of the k best matches of each query."""
+        query_vectors = normalize(np.atleast_2d(query_vectors).astype(np.float32))
+        if self._use_ivf():
+            return [
+                self._search_rows(query, self.ivf.candidates(query, self._size), k)
+                for query in query_vectors
+            ]
+        if self._use_codes():
+            all_approx = self.quantizer.scores(
+                self._codes[: self._size], self._scales[: self._size], query_vectors
+            )
+            return [
+                self._rescore(query, top_k_indices(approx, self.rescore_factor * k), k)
+                for query, approx in zip(query_vectors, all_approx)
+            ]
+
+        all_scores = query_vectors @ self.vectors.T
+        return [
+            (top, scores[top])
+            for scores in all_scores
+            for top in [top_k_indices(scores, k)]
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        [(rows, scores)] = self.top_k(np.asarray(embedding), k)
+        return [
+            (self._document(int(row)), float(np.clip((1 + score) / 2, 0, 1)))
+            for row, score in zip(rows, scores)
+        ]
+
+    def similarity_search_by_vectors(
+        self, embeddings: List[List[float]], k: int = 4
+    ) -> List[List[Document]]:
+        """Search several query embeddings with a single top_k call."""
+        if not len(embeddings):
+            return []
+        return [
+            [self._document(int(row)) for row in rows]
+            for rows, _ in self.top_k(np.asarray(embeddings), k)
+        ]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k)
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        path: Union[str, Path],
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
@@ -0,0 +1,165 @@
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+QUANTIZATION_DTYPES = {"float16": np.float16, "int8": np.int8}
+INT8_MAX = 127
+
+
+class VectorQuantizer:
+    """
+    Compact form of normalized embeddings used to scan candidates cheaply.
+
+    Vectors are optionally reduced to `dimensions` by keeping their first
+    coordinates (embeddings such as text-embedding-004 are trained so that
+    prefixes remain meaningful) or by a PCA projection, then stored as float16,
+    or as int8 with one float32 scale per vector. Scores computed on the codes
+    are approximate: callers rescore the best candidates with the full vectors.
+    """
+
+    def __init__(
+        self,
+        dtype: str = "int8",
+        dimensions: Optional[int] = None,
+        projection: str = "truncate",
+        pca_sample: int = 50_000,
+        seed: int = 0,
+    ):
+        if dtype not in QUANTIZATION_DTYPES:
+            raise ValueError(f"Unknown quantization: {dtype}")
+        if projection not in ("truncate", "pca"):
+            raise ValueError(f"Unknown projection: {projection}")
+        self.dtype = dtype
+        self.dimensions = dimensions
+        self.projection = projection
+        self.pca_sample = pca_sample
+        self.seed = seed
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    @property
+    def fitted(self) -> bool:
+        return (
+            self.projection == "truncate"
+            or self.dimensions is None
+            or self.components is not None
+        )
+
+    def reset(self) -> None:
+        self.mean = None
+        self.components = None
+
+    def fit(self, vectors: np.ndarray) -> None:
+        """Fit the PCA projection on (a sample of) vectors."""
+        if self.fitted:
+            return
+        rng = np.random.default_rng(self.seed)
+        n_sample = min(len(vectors), self.pca_sample)
+        sample = np.asarray(
+            vectors[np.sort(rng.choice(len(vectors), n_sample, replace=False))],
+            dtype=np.float32,
+        )
+        self.mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = vt[: self.dimensions].T.astype(np.float32)
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dimensions is None:
+            return vectors
+        if self.projection == "truncate":
+            return vectors[..., : self.dimensions]
+        return (vectors - self.mean) @ self.components
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the codes and per-vector scales of vectors."""
+        projected = self.project(vectors)
+        if self.dtype == "float16":
+            return projected.astype(np.float16), np.ones(len(projected), np.float32)
+        scales = np.abs(projected).max(axis=1) / INT8_MAX
+        scales[scales == 0] = 1
+        codes = np.rint(projected / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def scores(
+        self,
+        codes: np.ndarray,
+        scales: np.ndarray,
+        queries: np.ndarray,
+        block_size: int = 4096,
+    ) -> np.ndarray:
+        """
+        Approximate dot products of normalized queries with encoded vectors, of
+        shape (n_queries, n_vectors), or (n_vectors,) for a single query.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.components is not None:
+            # q.v ~ q.mean + q.C.p(v), the first term doesn't change the ranking
+            projected = queries @ self.components
+        else:
+            projected = self.project(queries)
+        # NumPy has no BLAS kernels for float16/int8, upcast one block at a time
+        # and score every query against it
+        projected = np.atleast_2d(projected)
+        scores = np.empty((len(projected), len(codes)), dtype=np.float32)
+        for i in range(0, len(codes), block_size):
+            block = codes[i : i + block_size].astype(np.float32)
+            scores[:, i : i + block_size] = projected @ block.T
+        scores *= scales
+        return scores if queries.ndim > 1 else scores[0]
+
+    def save(self, path: Union[str, Path], codes: np.ndarray, scales: np.ndarray):
+        arrays = {"codes": codes, "scales": scales}
+        if self.components is not None:
+            arrays.update(mean=self.mean, components=self.components)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    def load(self, path: Union[str, Path]) -> Tuple[np.ndarray, np.ndarray]:
+        with np.load(path) as data:
+            if "components" in data:
+                self.mean = data["mean"]
+                self.components = data["components"]
+            return data["codes"].copy(), data["scales"].copy()
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Keep the first `dimensions` coordinates of another model's embeddings,
+    renormalized, to store smaller vectors in MongoDB.
+
+    The model name includes the dimensions, so documents embedded with another
+    size are re-embedded by incremental indexing.
+    """
+
+    def __init__(self, embeddings: Embeddings, dimensions: int):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    @property
+    def model(self) -> str:
+        model = getattr(self.embeddings, "model", type(self.embeddings).__name__)
+        return f"{model}@{self.dimensions}"
+
+    def _truncate(self, vectors: List[List[float]]) -> List[List[float]]:
+        truncated = np.asarray(vectors, dtype=np.float32)[:, : self.dimensions]
+        norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+        return (truncated / np.where(norms == 0, 1, norms)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._truncate(self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._truncate([self.embeddings.embed_query(text)])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._truncate(await self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._truncate([await self.embeddings.aembed_query(text)])[0]
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second on average."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        while True:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit adjusted with additive increase / multiplicative decrease.
+
+    Every fast success raises the limit by 1/limit (about one slot per round of
+    requests); a throttling error or a response slower than `target_latency`
+    multiplies it by `decrease_factor`, never going below `min_limit`.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        target_latency: float = 5.0,
+        decrease_factor: float = 0.5,
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.counters = Counter()
+        self._condition: Optional[asyncio.Condition] = None
+        self._condition_loop = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # asyncio primitives are bound to a loop, recreate them for a new one
+        loop = asyncio.get_running_loop()
+        if self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+        return self._condition
+
+    def on_success(self, latency: float):
+        if latency > self.target_latency:
+            self.counters["slow_responses"] += 1
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        self.counters["throttled"] += 1
+        self._decrease()
+
+    def _decrease(self):
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+    @asynccontextmanager
+    async def slot(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
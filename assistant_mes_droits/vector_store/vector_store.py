@@ -1,55 +1,430 @@
+import asyncio
+import hashlib
+import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from uuid import uuid4
 
 from dotenv import load_dotenv
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_mongodb import MongoDBAtlasVectorSearch
-from pymongo import MongoClient, errors
+from langchain_mongodb.pipelines import vector_search_stage
+from langchain_mongodb.utils import make_serializable, str_to_oid
+from pymongo import MongoClient, ReplaceOne, ReturnDocument, errors
+from pymongo.operations import SearchIndexModel
 from tenacity import retry, stop_after_attempt, wait_exponential
 from tqdm import tqdm
 
+from assistant_mes_droits.data_processing.chunking import chunk_publication
 from assistant_mes_droits.logger import logger
 from assistant_mes_droits.vector_store.embedding import GeminiAPIEmbeddings
+from assistant_mes_droits.vector_store.embedding_cache import (
+    EMBEDDING_CACHE_PATH,
+    CachedEmbeddings,
+)
+from assistant_mes_droits.vector_store.numpy_store import NumpyVectorStore
+from assistant_mes_droits.vector_store.quantization import TruncatedEmbeddings
 
 # Load environment variables from root .env
 env_path = Path(__file__).resolve().parents[2] / ".env"
 if env_path.is_file():
     load_dotenv(dotenv_path=env_path)
 
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "mongodb")
+LOCAL_VECTOR_STORE_PATH = Path(
+    os.getenv(
+        "LOCAL_VECTOR_STORE_PATH",
+        Path.home() / ".cache" / "assistant_mes_droits" / "vector_store",
+    )
+)
+
+TEXT_KEY = "text"
+EMBEDDING_KEY = "embedding"
+GENERATIONS_COLLECTION = "generations"
+GENERATION_FILE = "generation.json"
+# Publication fields stored with each document, the store adds its own
+# bookkeeping fields (content hash, embedding model, date, passage position)
+METADATA_FIELDS = ("id", "title", "sp_url")
+# Fields returned by search, passages need their position to be merged
+SEARCH_FIELDS = ("id", "title", "sp_url", "parent_id", "chunk_index")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def group_by_parent(docs: List[Document]) -> List[Document]:
+    """Merge passages sharing a parent publication, keeping rank and chunk order."""
+    groups: Dict[object, List[Document]] = {}
+    for doc in docs:
+        parent_id = doc.metadata.get("parent_id")
+        groups.setdefault(parent_id if parent_id is not None else id(doc), []).append(
+            doc
+        )
+
+    grouped = []
+    for chunks in groups.values():
+        if len(chunks) == 1:
+            grouped.append(chunks[0])
+            continue
+        chunks_in_order = sorted(chunks, key=lambda d: d.metadata["chunk_index"])
+        grouped.append(
+            Document(
+                page_content="\n\n".join(d.page_content for d in chunks_in_order),
+                metadata={
+                    **chunks[0].metadata,
+                    "chunk_index": [d.metadata["chunk_index"] for d in chunks_in_order],
+                },
+            )
+        )
+    return grouped
+
+
+def _publication_key(doc: Document):
+    return doc.metadata.get("parent_id") or doc.metadata.get("_id") or id(doc)
+
+
+def reciprocal_rank_fusion(
+    passage_lists: List[List[Document]], rrf_k: int = 60
+) -> List[Document]:
+    """
+    Merge the ranked passages of several queries into one list of publications.
+
+    Each publication scores sum(1 / (rrf_k + rank)) over the queries that found
+    it, rank being its position among the publications of that query. Its
+    passages found by any query are merged once, and the fused score is stored
+    in metadata["rrf_score"].
+    """
+    scores: Dict[object, float] = {}
+    passages: Dict[object, Dict[object, Document]] = {}
+    for docs in passage_lists:
+        ranks: Dict[object, int] = {}
+        for doc in docs:
+            key = _publication_key(doc)
+            ranks.setdefault(key, len(ranks) + 1)
+            passage_key = doc.metadata.get("_id") or (key, doc.page_content)
+            passages.setdefault(key, {}).setdefault(passage_key, doc)
+        for key, rank in ranks.items():
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    fused = group_by_parent([doc for key in ranked for doc in passages[key].values()])
+    return [
+        Document(
+            page_content=doc.page_content,
+            metadata={**doc.metadata, "rrf_score": scores[_publication_key(doc)]},
+        )
+        for doc in fused
+    ]
+
 
 class PublicationVectorStore:
-    """MongoDB vector store for PublicationModel objects with Gemini embeddings."""
+    """
+    Vector store for PublicationModel objects with Gemini embeddings.
+
+    Backed by MongoDB Atlas Vector Search, or by an in-process NumPy index
+    persisted under `local_path` with backend="numpy". The NumPy index is exact
+    unless `local_index="ivf"`, see NumpyVectorStore for `local_index_params`.
+
+    `quantization` and `reduced_dimensions` shrink the stored vectors. The NumPy
+    index scans float16/int8 codes, truncated or PCA-projected, and rescores
+    its best candidates with the full vectors. On Atlas, vectors are truncated
+    before being written and "int8" enables the scalar quantization of the
+    vector index, which rescores with the stored vectors itself.
+    """
 
     def __init__(
         self,
         db_name: str = "assistant_mes_droits",
         collection_name: str = "publications",
         index_name: str = "publication_vector_index",
+        chunk_size: Optional[int] = 2000,
+        chunk_overlap: int = 200,
+        embedding_cache_path: Optional[Path] = EMBEDDING_CACHE_PATH,
+        backend: str = VECTOR_STORE_BACKEND,
+        local_path: Path = LOCAL_VECTOR_STORE_PATH,
+        embeddings: Optional[Embeddings] = None,
+        dimensions: int = 768,
+        local_index: str = "exact",
+        local_index_params: Optional[Dict[str, Any]] = None,
+        quantization: Optional[str] = None,
+        reduced_dimensions: Optional[int] = None,
+        projection: str = "truncate",
+        batch_size: int = 100,
+        write_concurrency: int = 2,
+        pointer_ttl: float = 5.0,
+        metadata_fields: Sequence[str] = METADATA_FIELDS,
     ):
-        self.client = MongoClient(os.getenv("MONGO_CONNECTION"))
+        self.backend = backend
+        self.dimensions = dimensions
         self.db_name = db_name
         self.collection_name = collection_name
         self.index_name = index_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.quantization = quantization
+        self.batch_size = batch_size
+        self.write_concurrency = write_concurrency
+        self.pointer_ttl = pointer_ttl
+        self.metadata_fields = tuple(metadata_fields)
+        self.local_path = Path(local_path)
+        self._write_lock = threading.Lock()
 
-        self.embeddings = GeminiAPIEmbeddings(
+        self.embeddings = embeddings or GeminiAPIEmbeddings(
             model="text-embedding-004",
         )
+        if embedding_cache_path is not None:
+            self.embeddings = CachedEmbeddings(self.embeddings, embedding_cache_path)
+
+        if self.backend == "numpy":
+            self.client = None
+            self.collection = None
+            self._numpy_params = dict(
+                index=local_index,
+                quantization=quantization,
+                reduced_dimensions=reduced_dimensions,
+                projection=projection,
+                **(local_index_params or {}),
+            )
+            self._open_generation()
+            return
+        if self.backend != "mongodb":
+            raise ValueError(f"Unknown vector store backend: {self.backend}")
+        if quantization not in (None, "int8"):
+            raise ValueError(f"Atlas Vector Search can't use {quantization} vectors")
+        if reduced_dimensions is not None:
+            if projection != "truncate":
+                raise ValueError("Only truncation is supported with MongoDB")
+            self.embeddings = TruncatedEmbeddings(self.embeddings, reduced_dimensions)
+            self.dimensions = reduced_dimensions
+
+        self.client = MongoClient(os.getenv("MONGO_CONNECTION"))
+        self._open_generation()
+        self._create_index()
+
+    # Generations
+
+    def _pointer(self) -> dict:
+        """The generation pointer document, empty before the first write."""
+        if self.backend == "numpy":
+            pointer_path = self.local_path / GENERATION_FILE
+            if not pointer_path.is_file():
+                return {}
+            return json.loads(pointer_path.read_text())
+        pointer = self.client[self.db_name][GENERATIONS_COLLECTION].find_one(
+            {"_id": self.collection_name}
+        )
+        return pointer or {}
+
+    def _read_pointer(self) -> Tuple[int, str]:
+        """
+        Read the current (generation, location) of the corpus: a collection
+        name, or a directory under `local_path` ("" for `local_path` itself).
+        Before the first re-index, this is generation 0 in the original place.
+        """
+        pointer = self._pointer()
+        if not pointer:
+            return 0, "" if self.backend == "numpy" else self.collection_name
+        return pointer["generation"], pointer["location"]
+
+    def indexed_source(self) -> Optional[str]:
+        """
+        The `source` of the last `add_publications` or `reindex` run that
+        completed, e.g. the sha256 of the indexed archive.
+        """
+        return self._pointer().get("source")
+
+    def _write_pointer(
+        self,
+        expected_location: str,
+        location: str,
+        generation: Optional[int] = None,
+        source: Optional[str] = None,
+    ) -> None:
+        """
+        Atomically point readers to a location, if the pointer is still on
+        `expected_location`. The generation is set when given, else incremented.
+        The recorded source is replaced when given, else kept.
+
+        Raises RuntimeError when another process switched the pointer, e.g. a
+        re-index that finished while this process was updating in place.
+        """
+        if self.backend == "numpy":
+            pointer = self._pointer()
+            current_location = pointer.get("location", "")
+            if current_location != expected_location:
+                raise self._pointer_conflict(expected_location, current_location)
+            if generation is None:
+                generation = pointer.get("generation", 0) + 1
+            self.local_path.mkdir(parents=True, exist_ok=True)
+            pointer_tmp = self.local_path / f"{GENERATION_FILE}.tmp"
+            pointer_tmp.write_text(
+                json.dumps(
+                    {
+                        "generation": generation,
+                        "location": location,
+                        "source": source or pointer.get("source"),
+                    }
+                )
+            )
+            os.replace(pointer_tmp, self.local_path / GENERATION_FILE)
+        else:
+            update = {"$set": {"location": location, "updated_at": datetime.now(UTC)}}
+            if generation is None:
+                update["$inc"] = {"generation": 1}
+            else:
+                update["$set"]["generation"] = generation
+            if source is not None:
+                update["$set"]["source"] = source
+            pointers = self.client[self.db_name][GENERATIONS_COLLECTION]
+            try:
+                # Upserts the first pointer, or fails on the _id of a moved one
+                pointer = pointers.find_one_and_update(
+                    {"_id": self.collection_name, "location": expected_location},
+                    update,
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except errors.DuplicateKeyError:
+                raise self._pointer_conflict(
+                    expected_location, self._read_pointer()[1]
+                ) from None
+            generation = pointer["generation"]
+        self.generation, self.location = generation, location
+        self._pointer_read_at = time.monotonic()
+
+    @staticmethod
+    def _pointer_conflict(expected_location: str, location: str) -> RuntimeError:
+        return RuntimeError(
+            f"Generation pointer moved from {expected_location!r} to {location!r}"
+        )
+
+    def _generation_location(self, generation: int) -> str:
+        if self.backend == "numpy":
+            return f"g{generation}"
+        return f"{self.collection_name}_g{generation}"
 
-        self.collection = self.client[self.db_name][self.collection_name]
-        self.vector_store = MongoDBAtlasVectorSearch(
-            collection=self.collection,
+    def _open_generation(self, generation: Optional[int] = None, location=None):
+        """Bind the store to a generation, the one of the pointer by default."""
+        if generation is None:
+            generation, location = self._read_pointer()
+        self.generation, self.location = generation, location
+        self._pointer_read_at = time.monotonic()
+        self.vector_store = self._open_location(location)
+        if self.backend == "mongodb":
+            self.collection = self.vector_store.collection
+
+    def _open_location(self, location: str):
+        if self.backend == "numpy":
+            return NumpyVectorStore(
+                self.local_path / location,
+                embedding=self.embeddings,
+                dimensions=self.dimensions,
+                **self._numpy_params,
+            )
+        return MongoDBAtlasVectorSearch(
+            collection=self.client[self.db_name][location],
             embedding=self.embeddings,
             index_name=self.index_name,
+            text_key=TEXT_KEY,
+            embedding_key=EMBEDDING_KEY,
         )
-        self._create_index()
+
+    def _drop_location(self, location: str) -> None:
+        if self.backend == "numpy":
+            self._open_location(location).drop()
+        else:
+            # Also drops the vector search index of the collection
+            self.client[self.db_name][location].drop()
+
+    def _count_documents(self) -> int:
+        if self.backend == "numpy":
+            return len(self.vector_store)
+        return self.collection.count_documents({})
+
+    def _wait_for_index(self, timeout: float = 600.0, poll_interval: float = 5.0):
+        """Wait until the vector index of the current collection is queryable."""
+        if self.backend == "numpy":
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            indexes = list(self.collection.list_search_indexes(self.index_name))
+            if indexes and indexes[0].get("queryable"):
+                return
+            time.sleep(poll_interval)
+        raise TimeoutError(f"Index {self.index_name} of {self.location} not ready")
+
+    def reindex(
+        self,
+        publications: Iterable,
+        index_timeout: float = 600.0,
+        source: Optional[str] = None,
+    ) -> int:
+        """
+        Rebuild the whole corpus as a new generation, then switch to it.
+
+        Publications are written to a staging collection (a directory with the
+        NumPy backend) with its own vector index, while searches keep using the
+        live generation. Once the staging document count matches the number of
+        documents written and its index is queryable, the generation pointer is
+        updated in a single write and the previous generation is dropped.
+
+        Args:
+            publications: Iterable of PublicationModel instances
+            index_timeout: Seconds to wait for the staging vector index
+            source: Recorded with the new generation, see `indexed_source`
+
+        Returns:
+            The new generation number
+        """
+        old_generation, old_location = self._read_pointer()
+        generation = old_generation + 1
+        location = self._generation_location(generation)
+        # Leftovers of an interrupted re-index
+        self._drop_location(location)
+
+        self._open_generation(generation, location)
+        try:
+            if self.backend == "mongodb":
+                self._create_index()
+            _, written = self._write_publications(publications, {}, datetime.now(UTC))
+            self._persist()
+            count = self._count_documents()
+            if count != written:
+                raise RuntimeError(
+                    f"Generation {generation} has {count} documents, expected {written}"
+                )
+            self._wait_for_index(index_timeout)
+        except BaseException:
+            self._open_generation(old_generation, old_location)
+            raise
+
+        try:
+            self._write_pointer(old_location, location, generation, source)
+        except RuntimeError:
+            # Another process switched generations meanwhile, follow it
+            self._drop_location(location)
+            self._open_generation()
+            raise
+        logger.info(f"Switched to generation {generation} ({written} documents)")
+        self._drop_location(old_location)
+        return generation
 
     def _create_index(self):
         """Create vector search index if it doesn't exist, skip if already exists."""
         try:
-            self.vector_store.create_vector_search_index(dimensions=768)
+            if self.quantization is None:
+                self.vector_store.create_vector_search_index(dimensions=self.dimensions)
+            else:
+                self._create_quantized_index()
         except errors.OperationFailure as e:
             if e.code == 68:  # IndexAlreadyExists error code
                 logger.info(
@@ -58,56 +433,257 @@ class PublicationVectorStore:
             else:
                 raise
 
-    def add_publications(self, publications: List) -> None:
+    def _create_quantized_index(self):
+        try:
+            self.collection.database.create_collection(self.collection.name)
+        except errors.CollectionInvalid:
+            pass
+        self.collection.create_search_index(
+            SearchIndexModel(
+                definition={
+                    "fields": [
+                        {
+                            "type": "vector",
+                            "path": EMBEDDING_KEY,
+                            "numDimensions": self.dimensions,
+                            "similarity": "cosine",
+                            "quantization": "scalar",
+                        }
+                    ]
+                },
+                name=self.index_name,
+                type="vectorSearch",
+            )
+        )
+
+    def add_publications(
+        self,
+        publications: Iterable,
+        incremental: bool = False,
+        source: Optional[str] = None,
+    ) -> None:
         """
         Add multiple publications to the vector store with retries and batching.
 
+        Publications are consumed lazily, `batch_size` at a time, so a generator
+        such as `iter_publications()` can be indexed while it is still parsing.
+        Each batch is embedded with the rate limited `aembed_documents`, then
+        upserted in the background by up to `write_concurrency` writers while
+        the next batch is being embedded.
+
+        Publications are split into passages when the store has a `chunk_size`,
+        each stored as its own document with the parent publication ID.
+        Each document stores a hash of its content and the embedding model name.
+        In incremental mode, documents whose hash and model are unchanged are
+        neither embedded nor written, and only the IDs missing from
+        `publications` are deleted instead of every document older than this run.
+
         Args:
-            publications: List of PublicationModel instances
+            publications: Iterable of PublicationModel instances
+            incremental: Skip unchanged publications and delete only removed ones
+            source: Recorded once every publication is written, see
+                `indexed_source`
         """
         current_time = datetime.now(UTC)
+        indexed = self._get_indexed_hashes() if incremental else {}
+        seen_ids, _ = self._write_publications(publications, indexed, current_time)
+
+        if incremental:
+            self._delete_missing_documents(set(indexed) - seen_ids)
+        else:
+            # Cleanup old documents after successful insertion
+            self._delete_old_documents(current_time)
+        self._persist()
+        # Same location, but the corpus changed
+        self._write_pointer(self.location, self.location, source=source)
+
+    def _write_publications(
+        self,
+        publications: Iterable,
+        indexed: Dict[str, Tuple[str, str]],
+        current_time: datetime,
+    ) -> Tuple[Set[str], int]:
+        """
+        Embed and write the documents of publications, skipping those indexed
+        with the same hash and model. Returns the IDs seen and the number of
+        documents written.
+        """
+        publications = iter(publications)
+        seen_ids = set()
+        skipped = 0
+        written = 0
+
+        with (
+            asyncio.Runner() as runner,
+            ThreadPoolExecutor(max_workers=self.write_concurrency) as writers,
+            tqdm() as progress,
+        ):
+            writes = deque()
+            while batch := list(islice(publications, self.batch_size)):
+                batch_docs = []
+                batch_ids = []
+                for pub in batch:
+                    for doc_id, doc in self._publication_documents(pub):
+                        seen_ids.add(doc_id)
+                        if indexed.get(doc_id) == (
+                            doc.metadata["content_hash"],
+                            doc.metadata["embedding_model"],
+                        ):
+                            skipped += 1
+                            continue
+                        # Add timestamp metadata for cleanup
+                        doc.metadata["date_added"] = current_time
+                        batch_docs.append(doc)
+                        batch_ids.append(doc_id)
+                if batch_docs:
+                    vectors = self._embed_batch(runner, batch_docs)
+                    # Bound the batches held in memory waiting to be written
+                    while len(writes) >= self.write_concurrency:
+                        writes.popleft().result()
+                    writes.append(
+                        writers.submit(
+                            self._write_batch_with_retry, batch_docs, batch_ids, vectors
+                        )
+                    )
+                    written += len(batch_docs)
+                progress.update(len(batch))
+            for write in writes:
+                write.result()
+
+        if indexed:
+            logger.info(f"Skipped {skipped} unchanged documents")
+        return seen_ids, written
+
+    def _publication_documents(self, pub) -> List[Tuple[str, Document]]:
+        """
+        Build the documents stored for a publication: the whole markdown, or one
+        document per passage with its parent publication ID when chunking.
+        Only `metadata_fields` of the publication are stored, its content is
+        already rendered in page_content.
+        """
+        pub_data = pub.dict(include=set(self.metadata_fields))
+        if not pub_data.get("id"):
+            pub_data["id"] = str(uuid4())
+        pub_data["embedding_model"] = getattr(
+            self.embeddings, "model", type(self.embeddings).__name__
+        )
+
+        if self.chunk_size is None:
+            page_content = pub.to_markdown()
+            pub_data["content_hash"] = content_hash(page_content)
+            return [
+                (pub_data["id"], Document(page_content=page_content, metadata=pub_data))
+            ]
+
         documents = []
-        ids = []
-
-        for pub in publications:
-            pub_data = pub.dict()
-            if not pub_data.get("id"):
-                pub_data["id"] = str(uuid4())
-            # Add timestamp metadata for cleanup
-            pub_data["date_added"] = current_time
+        chunks = chunk_publication(pub, self.chunk_size, self.chunk_overlap)
+        for chunk_index, chunk in enumerate(chunks):
+            metadata = {
+                **pub_data,
+                "parent_id": pub_data["id"],
+                "chunk_index": chunk_index,
+                "content_hash": content_hash(chunk),
+            }
             documents.append(
-                Document(page_content=pub.to_markdown(), metadata=pub_data)
+                (
+                    f"{pub_data['id']}#{chunk_index}",
+                    Document(page_content=chunk, metadata=metadata),
+                )
             )
-            ids.append(pub_data["id"])
+        return documents
 
-        batch_size = 20
-        for i in tqdm(range(0, len(documents), batch_size)):
-            batch_docs = documents[i : i + batch_size]
-            batch_ids = ids[i : i + batch_size]
-            self._add_batch_with_retry(batch_docs, batch_ids)
+    def _get_indexed_hashes(self) -> Dict[str, Tuple[str, str]]:
+        """Map each stored document ID to its (content_hash, embedding_model)."""
+        if self.backend == "numpy":
+            return {
+                _id: (metadata.get("content_hash"), metadata.get("embedding_model"))
+                for _id, metadata in self.vector_store.iter_metadata()
+            }
+        cursor = self.collection.find(
+            {}, projection={"content_hash": 1, "embedding_model": 1}
+        )
+        return {
+            str(doc["_id"]): (doc.get("content_hash"), doc.get("embedding_model"))
+            for doc in cursor
+        }
 
-        # Cleanup old documents after successful insertion
-        self._delete_old_documents(current_time)
+    def _delete_missing_documents(self, ids: Set[str]) -> None:
+        """Delete documents whose IDs disappeared from the latest dump."""
+        ids = sorted(ids)
+        batch_size = 200
+        for i in range(0, len(ids), batch_size):
+            self.vector_store.delete(ids=ids[i : i + batch_size])
+        logger.info(f"Deleted {len(ids)} publications missing from the dump")
+
+    def _embed_batch(
+        self, runner: asyncio.Runner, batch_docs: List[Document]
+    ) -> List[List[float]]:
+        """
+        Embed a batch with aembed_documents, on the event loop of the run:
+        Gemini requests are paced by the token bucket and adaptive concurrency
+        of the embeddings, and failed texts are retried on their own.
+        """
+        texts = [doc.page_content for doc in batch_docs]
+        return runner.run(self.embeddings.aembed_documents(texts))
 
     @retry(
         stop=stop_after_attempt(10),
         wait=wait_exponential(multiplier=2, min=30, max=120),
     )
-    def _add_batch_with_retry(self, batch_docs: List[Document], batch_ids: List[str]):
-        """Retry a batch insertion up to 10 times with exponential backoff."""
-        # Delete existing documents first to prevent conflicts
-        if batch_ids:
-            self.vector_store.delete(ids=batch_ids)
-        # Insert new documents
-        self.vector_store.add_documents(
-            documents=batch_docs, ids=batch_ids, batch_size=len(batch_docs)
+    def _write_batch_with_retry(
+        self,
+        batch_docs: List[Document],
+        batch_ids: List[str],
+        vectors: List[List[float]],
+    ):
+        """
+        Upsert embedded documents, replacing stored documents with the same ID
+        in place so they stay searchable during re-indexing.
+        """
+        if self.backend == "numpy":
+            with self._write_lock:
+                self.vector_store.upsert(
+                    batch_ids,
+                    [doc.page_content for doc in batch_docs],
+                    vectors,
+                    [doc.metadata for doc in batch_docs],
+                )
+            return
+
+        # Same layout as MongoDBAtlasVectorSearch.add_documents
+        self.collection.bulk_write(
+            [
+                ReplaceOne(
+                    {"_id": str_to_oid(doc_id)},
+                    {
+                        TEXT_KEY: doc.page_content,
+                        EMBEDDING_KEY: vector,
+                        **doc.metadata,
+                    },
+                    upsert=True,
+                )
+                for doc_id, doc, vector in zip(batch_ids, batch_docs, vectors)
+            ],
+            ordered=False,
         )
 
     def _delete_old_documents(self, cutoff_time: datetime):
         """Delete documents older than given timestamp in batches."""
         logger.info("Starting gradual deletion of old documents...")
-        collection = self.client[self.db_name][self.collection_name]
-        query = {"metadata.date_added": {"$lt": cutoff_time}}
+        if self.backend == "numpy":
+            old_ids = [
+                _id
+                for _id, metadata in self.vector_store.iter_metadata()
+                if datetime.fromisoformat(str(metadata["date_added"])) < cutoff_time
+            ]
+            self.vector_store.delete(ids=old_ids)
+            logger.info(
+                f"Completed old documents cleanup. Total deleted: {len(old_ids)}"
+            )
+            return
+
+        collection = self.collection
+        query = {"date_added": {"$lt": cutoff_time}}
 
         batch_size = 200
         total_deleted = 0
@@ -134,19 +710,198 @@ class PublicationVectorStore:
 
     def delete_publication(self, publication_id: str) -> bool:
         """
-        Delete a publication by ID.
+        Delete a publication by ID, along with its passages when chunked.
+        The generation only changes when documents were actually deleted.
 
         Args:
             publication_id: ID of the publication to delete
+
+        Returns:
+            Whether any document of the publication was deleted
         """
-        return self.vector_store.delete(ids=[publication_id])
+        if self.backend == "numpy":
+            ids = [
+                _id
+                for _id, metadata in self.vector_store.iter_metadata()
+                if _id == publication_id or metadata.get("parent_id") == publication_id
+            ]
+            self.vector_store.delete(ids=ids)
+            deleted = len(ids)
+        else:
+            query = {"_id": str_to_oid(publication_id)}
+            if self.chunk_size is not None:
+                query = {"$or": [query, {"parent_id": publication_id}]}
+            deleted = self.collection.delete_many(query).deleted_count
+        if not deleted:
+            return False
+        self._persist()
+        self._write_pointer(self.location, self.location)
+        return True
+
+    def _persist(self):
+        """Write the local index to disk, Atlas writes are already durable."""
+        if self.backend == "numpy":
+            self.vector_store.persist()
 
-    def search(self, query: str, k: int = 5) -> List[Document]:
+    def refresh(self) -> bool:
+        """
+        Pick up a new generation switched by another process, at most every
+        `pointer_ttl` seconds, or an index persisted by an ingestion job writing
+        to the local path shared by search replicas.
+        """
+        if time.monotonic() - self._pointer_read_at >= self.pointer_ttl:
+            generation, location = self._read_pointer()
+            self._pointer_read_at = time.monotonic()
+            if location != self.location:
+                self._open_generation(generation, location)
+                return True
+            self.generation = generation
+        if self.backend == "numpy":
+            return self.vector_store.refresh()
+        return False
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        fields: Optional[Sequence[str]] = SEARCH_FIELDS,
+    ) -> List[Document]:
         """
         Search publications by semantic similarity.
 
+        Passages of the same publication are merged into a single document, in
+        the order of the best ranked passage, so fewer than k documents can be
+        returned when the store is chunked.
+
         Args:
             query: Search query
-            k: Number of results to return
+            k: Number of passages to retrieve
+            fields: Metadata fields to return, None for all of them
         """
-        return self.vector_store.similarity_search(query, k=k)
+        self.refresh()
+        if fields is None:
+            docs = self.vector_store.similarity_search(query, k=k)
+        elif self.backend == "numpy":
+            docs = self._project(
+                self.vector_store.similarity_search(query, k=k), fields
+            )
+        else:
+            docs = self.vector_store.similarity_search(
+                query, k=k, post_filter_pipeline=self._projection_pipeline(fields)
+            )
+        return group_by_parent(docs)
+
+    @staticmethod
+    def _project(docs: List[Document], fields: Sequence[str]) -> List[Document]:
+        for doc in docs:
+            doc.metadata = {
+                key: value
+                for key, value in doc.metadata.items()
+                if key in fields or key == "_id"
+            }
+        return docs
+
+    @staticmethod
+    def _projection_pipeline(fields: Sequence[str]) -> List[dict]:
+        # Only transfer the needed fields from Atlas
+        projection = {field: 1 for field in fields}
+        return [{"$project": {**projection, TEXT_KEY: 1, "score": 1}}]
+
+    def _atlas_search_by_vector(
+        self, vector: List[float], k: int, fields: Optional[Sequence[str]]
+    ) -> List[Document]:
+        pipeline = [
+            vector_search_stage(vector, EMBEDDING_KEY, self.index_name, k),
+            {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+            {"$project": {EMBEDDING_KEY: 0}},
+        ]
+        if fields is not None:
+            pipeline += self._projection_pipeline(fields)
+        docs = []
+        for res in self.collection.aggregate(pipeline):
+            text = res.pop(TEXT_KEY)
+            make_serializable(res)
+            docs.append(Document(page_content=text, metadata=res))
+        return docs
+
+    def _search_by_vectors(
+        self,
+        vectors: List[List[float]],
+        k: int,
+        fields: Optional[Sequence[str]],
+    ) -> List[List[Document]]:
+        if self.backend == "numpy":
+            results = self.vector_store.similarity_search_by_vectors(vectors, k=k)
+            return [
+                docs if fields is None else self._project(docs, fields)
+                for docs in results
+            ]
+        with ThreadPoolExecutor(max_workers=len(vectors)) as executor:
+            return list(
+                executor.map(
+                    lambda vector: self._atlas_search_by_vector(vector, k, fields),
+                    vectors,
+                )
+            )
+
+    def search_passages(
+        self,
+        queries: List[str],
+        k: int = 5,
+        fields: Optional[Sequence[str]] = SEARCH_FIELDS,
+    ) -> List[List[Document]]:
+        """
+        Ranked passages of each query, embedding every query in one request and
+        running the vector searches together.
+        """
+        if not queries:
+            return []
+        self.refresh()
+        vectors = self.embeddings.embed_documents(list(queries))
+        return self._search_by_vectors(vectors, k, fields)
+
+    async def asearch_passages(
+        self,
+        queries: List[str],
+        k: int = 5,
+        fields: Optional[Sequence[str]] = SEARCH_FIELDS,
+    ) -> List[List[Document]]:
+        """
+        Async search_passages: queries are embedded with the async client, the
+        blocking pointer read and vector searches run in the default executor.
+        """
+        if not queries:
+            return []
+        await asyncio.to_thread(self.refresh)
+        vectors = await self.embeddings.aembed_documents(list(queries))
+        return await asyncio.to_thread(self._search_by_vectors, vectors, k, fields)
+
+    def search_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        fields: Optional[Sequence[str]] = SEARCH_FIELDS,
+        rrf_k: int = 60,
+    ) -> List[Document]:
+        """
+        Search several queries at once and return each publication only once,
+        ranked by reciprocal-rank fusion of the per-query results.
+
+        Args:
+            queries: Search queries
+            k: Number of passages to retrieve per query
+            fields: Metadata fields to return, None for all of them
+            rrf_k: Rank offset of the reciprocal-rank fusion
+        """
+        return reciprocal_rank_fusion(self.search_passages(queries, k, fields), rrf_k)
+
+    async def asearch_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        fields: Optional[Sequence[str]] = SEARCH_FIELDS,
+        rrf_k: int = 60,
+    ) -> List[Document]:
+        """Async search_many."""
+        passages = await self.asearch_passages(queries, k, fields)
+        return reciprocal_rank_fusion(passages, rrf_k)
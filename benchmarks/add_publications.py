@@ -0,0 +1,124 @@
+"""
+Compare sequential and pipelined ingestion in PublicationVectorStore, with
+fake embeddings and a fake MongoDB client that simulate network latency.
+
+Usage: python -m benchmarks.add_publications [n_publications] [latency_ms]
+(GOOGLE_API_KEY must be set, to any value, for the module clients to load)
+"""
+
+import sys
+import time
+from unittest.mock import patch
+
+from langchain_core.embeddings import Embeddings
+
+from assistant_mes_droits.data_processing.models import PublicationModel
+from assistant_mes_droits.vector_store.vector_store import (
+    GENERATIONS_COLLECTION,
+    PublicationVectorStore,
+)
+
+
+class SlowEmbeddings(Embeddings):
+    model = "slow-embedding"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [[1.0] * 8 for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class SlowCollection:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests += 1
+        time.sleep(self.latency)
+
+    def find(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        return []
+
+
+class FakeGenerations:
+    """Generation pointers, kept in memory."""
+
+    def __init__(self):
+        self.pointers = {}
+
+    def find_one(self, query):
+        return self.pointers.get(query["_id"])
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        pointer = self.pointers.setdefault(
+            query["_id"], {"generation": 0, "location": query["location"]}
+        )
+        pointer.update(update["$set"])
+        pointer["generation"] += update.get("$inc", {}).get("generation", 0)
+        return pointer
+
+
+class FakeDatabase:
+    """A SlowCollection per name, and the generation pointers."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.collections = {GENERATIONS_COLLECTION: FakeGenerations()}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, SlowCollection(self.latency))
+
+
+class FakeMongoClient:
+    def __init__(self, latency: float):
+        self.database = FakeDatabase(latency)
+
+    def __getitem__(self, db_name):
+        return self.database
+
+
+def run(label: str, publications, latency: float, **kwargs):
+    with patch.object(PublicationVectorStore, "_create_index"), patch(
+        "assistant_mes_droits.vector_store.vector_store.MongoClient",
+        return_value=FakeMongoClient(latency),
+    ):
+        store = PublicationVectorStore(
+            embeddings=SlowEmbeddings(latency),
+            embedding_cache_path=None,
+            backend="mongodb",
+            dimensions=8,
+            **kwargs,
+        )
+    start = time.perf_counter()
+    store.add_publications(publications)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {store.collection.requests:6d} writes {elapsed:8.2f}s")
+
+
+if __name__ == "__main__":
+    n_publications = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 100) / 1000
+
+    publications = [
+        PublicationModel(id=f"F{i}", title=f"Fiche {i}", paragraphs=["Contenu"])
+        for i in range(n_publications)
+    ]
+    print(f"{n_publications} publications, {latency * 1000:.0f} ms per request")
+
+    run(
+        "20 per batch, one writer",
+        publications,
+        latency,
+        batch_size=20,
+        write_concurrency=1,
+    )
+    run("100 per batch, 2 writers", publications, latency)
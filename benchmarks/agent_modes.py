@@ -0,0 +1,99 @@
+"""
+Compare the latency of the strict and fast agent modes, with a fake LLM whose
+response time grows with the size of its prompt and a fake search tool.
+
+Usage: python -m benchmarks.agent_modes [n_questions] [latency_ms]
+(GOOGLE_API_KEY must be set, to any value, for the module clients to load)
+"""
+
+import asyncio
+import sys
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+
+from assistant_mes_droits.agent.mes_droits_agent import (
+    AgentState,
+    Assertion,
+    Assertions,
+    CitedAnswer,
+    MesDroitsAgent,
+)
+
+SOURCE = "https://www.service-public.fr/particuliers/vosdroits/F1"
+# Seconds per character of prompt, about 25 ms per 1000 tokens
+PROMPT_LATENCY = 25e-3 / 4000
+
+
+@tool
+async def search(queries: list[str]) -> str:
+    """Fake search returning a packed context of one fiche."""
+    return f"## Fiche 1\nSource: {SOURCE}\n" + "Contenu de la fiche. " * 1000
+
+
+class SlowLLM:
+    """Fake chat model, each call waits latency + prompt size * PROMPT_LATENCY."""
+
+    def __init__(self, latency: float, stats=None, schema=None, tools=None):
+        self.latency = latency
+        self.stats = stats if stats is not None else {"calls": 0, "chars": 0}
+        self.schema = schema
+        self.tools = tools
+
+    def bind_tools(self, tools, tool_choice=None):
+        return SlowLLM(self.latency, self.stats, tools=tools)
+
+    def with_structured_output(self, schema):
+        return SlowLLM(self.latency, self.stats, schema=schema)
+
+    async def ainvoke(self, messages):
+        chars = sum(len(str(m.content)) for m in messages)
+        self.stats["calls"] += 1
+        self.stats["chars"] += chars
+        await asyncio.sleep(self.latency + chars * PROMPT_LATENCY)
+
+        assertion = Assertion(assertion="Vous avez droit à une aide.", source=SOURCE)
+        if self.tools:
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {"name": "search", "args": {"queries": ["aide"]}, "id": "1"}
+                ],
+            )
+        if self.schema is Assertions:
+            return Assertions(assertions=[assertion])
+        if self.schema is CitedAnswer:
+            return CitedAnswer(
+                answer=f"Vous avez droit à une aide ( {SOURCE} ).",
+                assertions=[assertion],
+            )
+        return AIMessage(content=f"Vous avez droit à une aide ( {SOURCE} ).")
+
+
+async def run_questions(graph, n_questions: int):
+    for i in range(n_questions):
+        state = AgentState(messages=[HumanMessage(content=f"Question {i}")])
+        await graph.ainvoke(state)
+
+
+def run(mode: str, n_questions: int, latency: float):
+    client = SlowLLM(latency)
+    agent = MesDroitsAgent(search_tools=[search], client=client, mode=mode)
+    start = time.perf_counter()
+    asyncio.run(run_questions(agent.graph, n_questions))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{mode:<8} {client.stats['calls'] / n_questions:4.1f} LLM calls "
+        f"{client.stats['chars'] / n_questions:10.0f} prompt chars "
+        f"{elapsed / n_questions * 1000:8.1f} ms per question"
+    )
+
+
+if __name__ == "__main__":
+    n_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 500) / 1000
+
+    print(f"{n_questions} questions, {latency * 1000:.0f} ms per LLM call")
+    for mode in ("strict", "fast"):
+        run(mode, n_questions, latency)
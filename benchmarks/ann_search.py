@@ -0,0 +1,86 @@
+"""
+Compare exact search with the IVF index and the quantized storage of
+NumpyVectorStore on synthetic clustered embeddings, reporting recall@k against
+the exact results, QPS and the memory scanned per query.
+
+Usage: python -m benchmarks.ann_search [n_vectors] [n_lists]
+"""
+
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from assistant_mes_droits.vector_store.numpy_store import NumpyVectorStore
+
+K = 10
+DIMENSIONS = 768
+
+
+def clustered_vectors(n: int, n_clusters: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((n_clusters, DIMENSIONS))
+    labels = rng.integers(n_clusters, size=n)
+    return (centers[labels] + 2.0 * rng.standard_normal((n, DIMENSIONS))).astype(
+        np.float32
+    )
+
+
+def run(label: str, store: NumpyVectorStore, queries, expected=None):
+    start = time.perf_counter()
+    results = [rows for rows, _ in store.top_k(queries, K)]
+    elapsed = time.perf_counter() - start
+    recall = (
+        np.mean([len(np.intersect1d(r, e)) / K for r, e in zip(results, expected)])
+        if expected is not None
+        else 1.0
+    )
+    print(f"{label:<24} recall@{K} {recall:6.3f} {len(queries) / elapsed:10.0f} QPS")
+    return results
+
+
+if __name__ == "__main__":
+    n_vectors = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n_lists = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(n_vectors + 200, n_clusters=500, rng=rng)
+    queries = vectors[n_vectors:]
+    ids = [str(i) for i in range(n_vectors)]
+    texts = [""] * n_vectors
+    print(f"{n_vectors} vectors of {DIMENSIONS} dims, {n_lists} lists")
+
+    with tempfile.TemporaryDirectory() as path:
+        exact = NumpyVectorStore(path, embedding=None, dimensions=DIMENSIONS)
+        exact.upsert(ids, texts, vectors[:n_vectors])
+        expected = run("exact", exact, queries)
+
+        ivf = NumpyVectorStore(
+            path, embedding=None, dimensions=DIMENSIONS, index="ivf", n_lists=n_lists
+        )
+        ivf.upsert(ids, texts, vectors[:n_vectors])
+        start = time.perf_counter()
+        ivf.train_index()
+        print(f"{'ivf training':<24} {time.perf_counter() - start:.2f}s")
+        for n_probe in (1, 4, 16, 64):
+            ivf.ivf.n_probe = n_probe
+            run(f"ivf n_probe={n_probe}", ivf, queries, expected)
+
+        print(f"{'float32 matrix':<24} {exact.vectors.nbytes / 2**20:8.1f} MiB")
+        for kwargs in (
+            {"quantization": "float16"},
+            {"quantization": "int8"},
+            {"quantization": "int8", "reduced_dimensions": 256},
+            {"quantization": "int8", "reduced_dimensions": 256, "projection": "pca"},
+        ):
+            label = " ".join(str(v) for v in kwargs.values())
+            quantized = NumpyVectorStore(
+                path, embedding=None, dimensions=DIMENSIONS, **kwargs
+            )
+            quantized.upsert(ids, texts, vectors[:n_vectors])
+            quantized.encode_vectors()
+            codes_size = (
+                quantized._codes[:n_vectors].nbytes + quantized._scales.nbytes
+            ) / 2**20
+            print(f"{label:<24} {codes_size:8.1f} MiB")
+            run(label, quantized, queries, expected)
@@ -0,0 +1,56 @@
+"""
+Compare one-request-per-text embedding with batched embed_content calls, using a
+local fake client that counts requests and simulates network latency.
+
+Usage: python -m benchmarks.embed_documents [n_texts] [latency_ms]
+(GOOGLE_API_KEY must be set, to any value, for the module clients to load)
+"""
+
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from assistant_mes_droits.vector_store.embedding import GeminiAPIEmbeddings
+
+
+class FakeGenAIClient:
+    def __init__(self, latency: float, dimensions: int = 768):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def embed_content(self, model, contents):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(
+            embeddings=[
+                SimpleNamespace(values=[float(len(text))] * self.dimensions)
+                for text in contents
+            ]
+        )
+
+
+def run(label: str, texts, latency: float, **kwargs):
+    client = FakeGenAIClient(latency=latency)
+    embeddings = GeminiAPIEmbeddings(client=client, **kwargs)
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+    print(f"{label:<40} {client.requests:6d} requests {elapsed:8.2f}s")
+
+
+if __name__ == "__main__":
+    n_texts = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 150) / 1000
+
+    texts = [f"Fiche {i} " * (i % 50 + 1) for i in range(n_texts)]
+    print(f"{n_texts} texts, {latency * 1000:.0f} ms per request")
+
+    # Previous behaviour: one request per text on 20 threads
+    run("per text (20 threads)", texts, latency, batch_size=1, max_concurrency=20)
+    run("batched (100 per request, 4 in flight)", texts, latency)
@@ -0,0 +1,64 @@
+"""
+Compare serial and process-pool parsing of a synthetic vosdroits-like archive.
+
+Usage: python -m benchmarks.parse_zip_content [n_publications] [workers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+from assistant_mes_droits.data_processing.parse import parse_zip_content
+
+
+def build_archive(n_publications: int, n_paragraphs: int = 40) -> bytes:
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(n_publications):
+            paragraphs = "".join(
+                f"<Paragraphe>Paragraphe {j} de la fiche\xa0{i}.</Paragraphe>"
+                for j in range(n_paragraphs)
+            )
+            items = "".join(f"<Item>Point {j}</Item>" for j in range(10))
+            zf.writestr(
+                f"F{i}.xml",
+                f"""<?xml version="1.0" encoding="UTF-8"?>
+<Publication ID="F{i}" spUrl="https://example.com/F{i}">
+<dc:title xmlns:dc="http://purl.org/dc/elements/1.1/">Fiche {i}</dc:title>
+{paragraphs}<Liste>{items}</Liste>
+</Publication>""",
+            )
+    return zip_buffer.getvalue()
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed:8.3f}s  ({len(result)} publications)")
+    return result, elapsed
+
+
+if __name__ == "__main__":
+    n_publications = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    zip_data = build_archive(n_publications)
+    print(f"Archive: {len(zip_data) / 1024 / 1024:.1f} MB, {n_publications} members")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The indexing path hands the cached archive path to the workers
+        path = Path(tmp_dir) / "archive.zip"
+        path.write_bytes(zip_data)
+        serial, serial_time = timed("serial", lambda: parse_zip_content(path))
+        parallel, parallel_time = timed(
+            f"parallel ({workers} workers)",
+            lambda: parse_zip_content(path, workers=workers),
+        )
+
+    assert [p.id for p in serial] == [p.id for p in parallel]
+    print(f"Speedup: {serial_time / parallel_time:.2f}x")
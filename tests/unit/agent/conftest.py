@@ -0,0 +1,80 @@
+import pytest
+
+
+def _bytes(value) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the Redis commands used by the caches and the
+    checkpointer. Like redis-py, values and hash fields are returned as bytes.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = _bytes(value)
+        self.ttls[key] = ex
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(_bytes(field))
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hkeys(self, key):
+        return list(self.data.get(key, {}))
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(
+            {_bytes(field): _bytes(value) for field, value in mapping.items()}
+        )
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.data.get(key, {}).pop(_bytes(field), None)
+
+    def hincrby(self, key, field, amount):
+        fields = self.data.setdefault(key, {})
+        fields[_bytes(field)] = _bytes(int(fields.get(_bytes(field), 0)) + amount)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Commands are queued, then run in order on execute()."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+
+        return command
+
+    def execute(self):
+        for command, args, kwargs in self.commands:
+            command(*args, **kwargs)
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
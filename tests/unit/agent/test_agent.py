@@ -1,14 +1,41 @@
-from langchain_core.messages import AIMessage, HumanMessage
+import asyncio
+import time
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.graph.message import add_messages
 
 from assistant_mes_droits.agent.agent import build_agent
-from assistant_mes_droits.agent.mes_droits_agent import AgentState
+from assistant_mes_droits.agent.mes_droits_agent import (
+    NO_SOURCED_ANSWER,
+    AgentState,
+    Assertion,
+    Assertions,
+    CitedAnswer,
+    MesDroitsAgent,
+    SpeculativeSearch,
+    agent_search_store,
+    search,
+    speculative_search,
+)
+from assistant_mes_droits.vector_store.vector_store import reciprocal_rank_fusion
+
+
+@tool
+async def slow_search(query: str) -> str:
+    """Fake search tool, fails on "erreur"."""
+    await asyncio.sleep(0.2)
+    if query == "erreur":
+        raise ValueError("search failed")
+    return f"Résultats pour {query}"
 
 
 def test_build_agent_initializes_correctly():
     agent_graph = build_agent()
 
     assert agent_graph is not None
-    assert hasattr(agent_graph, "invoke"), "Agent graph should have an invoke method"
+    assert hasattr(agent_graph, "ainvoke"), "Agent graph should have an ainvoke method"
 
 
 def test_agent_processes_message_and_returns_response():
@@ -20,7 +47,7 @@ def test_agent_processes_message_and_returns_response():
     config = {"configurable": {"thread_id": "test_thread_1"}}
 
     # Invoke the agent and validate the response structure
-    state_dict = agent_graph.invoke(initial_state, config=config)
+    state_dict = asyncio.run(agent_graph.ainvoke(initial_state, config=config))
     state = AgentState(**state_dict)
 
     # Basic response validation
@@ -31,3 +58,298 @@ def test_agent_processes_message_and_returns_response():
     assert (
         "factures" in state.messages[-1].content.lower()
     ), "Response should be relevant to query"
+
+
+def test_use_search_tool_runs_calls_concurrently_in_order():
+    agent = MesDroitsAgent(search_tools=[slow_search], client=None)
+    queries = ["permis", "erreur", "essai", "logement"]
+    message = AIMessage(
+        content="",
+        tool_calls=[
+            {"name": "slow_search", "args": {"query": q}, "id": str(i)}
+            for i, q in enumerate(queries)
+        ]
+        + [{"name": "unknown", "args": {}, "id": "4"}],
+    )
+
+    start = time.perf_counter()
+    result = asyncio.run(agent.use_search_tool(AgentState(messages=[message])))
+    assert time.perf_counter() - start < 0.6
+
+    messages = result["messages"]
+    assert [m.tool_call_id for m in messages] == ["0", "1", "2", "3", "4"]
+    assert messages[0].content == "Résultats pour permis"
+    assert messages[1].status == "error"
+    assert messages[2].content == "Résultats pour essai"
+    assert messages[4].status == "error"
+
+
+def test_search_calls_are_merged():
+    calls = [
+        {"name": "search", "args": {"queries": ["permis"]}, "id": "0"},
+        {"name": "slow_search", "args": {"query": "essai"}, "id": "1"},
+        {"name": "search", "args": {"queries": ["permis de conduire"]}, "id": "2"},
+    ]
+    merged = MesDroitsAgent._merge_search_calls(calls)
+    assert merged == [
+        {
+            "name": "search",
+            "args": {"queries": ["permis", "permis de conduire"]},
+            "id": "0",
+        },
+        {"name": "slow_search", "args": {"query": "essai"}, "id": "1"},
+    ]
+
+
+def test_generate_response_only_sees_the_assertions():
+    agent = MesDroitsAgent(search_tools=[slow_search], client=None)
+    question = HumanMessage(content="Question")
+    search_call = AIMessage(
+        content="",
+        tool_calls=[{"name": "slow_search", "args": {"query": "q"}, "id": "1"}],
+    )
+    results = ToolMessage(content="Contexte", tool_call_id="1", name="slow_search")
+    summary_call = AIMessage(
+        content="", tool_calls=[{"name": "summary", "args": {}, "id": "2"}]
+    )
+    summary = ToolMessage(content="Assertions", tool_call_id="2")
+
+    messages = agent._without_search_results(
+        [question, search_call, results, summary_call, summary]
+    )
+
+    assert messages == [question, summary_call, summary]
+
+
+class CitingClient:
+    """Fake client answering with a retrieved and an invented source."""
+
+    def __init__(self, assertions):
+        self.assertions = assertions
+
+    def with_structured_output(self, schema):
+        return self
+
+    async def ainvoke(self, messages):
+        return CitedAnswer(
+            answer="Oui ( https://sp.fr/F1 ), sans délai ( https://invente.fr ).",
+            assertions=[
+                Assertion(assertion="Oui", source=source) for source in self.assertions
+            ],
+        )
+
+
+def test_fast_mode_filters_citations_against_retrieved_sources():
+    state = AgentState(
+        messages=[
+            HumanMessage(content="Question"),
+            ToolMessage(
+                content="## Fiche 1\nSource: https://sp.fr/F1\nContenu",
+                tool_call_id="1",
+                name="slow_search",
+            ),
+        ]
+    )
+
+    agent = MesDroitsAgent(
+        search_tools=[slow_search],
+        client=CitingClient(["https://sp.fr/F1", "https://invente.fr"]),
+        mode="fast",
+    )
+    result = asyncio.run(agent.generate_cited_response(state))
+    assert result["messages"][0].content == "Oui ( https://sp.fr/F1 ), sans délai."
+    assert "generate_assertions" not in agent.graph.nodes
+
+    agent = MesDroitsAgent(
+        search_tools=[slow_search],
+        client=CitingClient(["https://invente.fr"]),
+        mode="fast",
+    )
+    result = asyncio.run(agent.generate_cited_response(state))
+    assert result["messages"][0].content == NO_SOURCED_ANSWER
+
+    # Trailing punctuation is ignored, as in the inline citations
+    agent = MesDroitsAgent(
+        search_tools=[slow_search],
+        client=CitingClient(["https://sp.fr/F1."]),
+        mode="fast",
+    )
+    result = asyncio.run(agent.generate_cited_response(state))
+    assert result["messages"][0].content == "Oui ( https://sp.fr/F1 ), sans délai."
+
+
+class QueryClient:
+    """Fake client writing a search call after a delay."""
+
+    def __init__(self, queries):
+        self.queries = queries
+
+    def bind_tools(self, tools, tool_choice=None):
+        return self
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(0.2)
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "search", "args": {"queries": self.queries}, "id": "1"}
+            ],
+        )
+
+
+class SlowStore:
+    def __init__(self):
+        self.queries = []
+
+    async def asearch_passages(self, queries, k=5):
+        await asyncio.sleep(0.2)
+        self.queries.extend(queries)
+        return [
+            [Document(page_content=q, metadata={"parent_id": q, "chunk_index": 0})]
+            for q in queries
+        ]
+
+    async def asearch_many(self, queries, k=5):
+        return reciprocal_rank_fusion(await self.asearch_passages(queries, k))
+
+
+def test_speculative_search_runs_during_query_generation():
+    state = AgentState(messages=[HumanMessage(content="Comment refaire mon permis ?")])
+
+    agent = MesDroitsAgent(
+        search_tools=[search],
+        client=QueryClient(["refaire mon permis de conduire"]),
+        speculative=True,
+        search_store=SlowStore(),
+    )
+    start = time.perf_counter()
+    result = asyncio.run(agent.generate_search_query(state))
+    assert time.perf_counter() - start < 0.35
+    assert result["speculative"].passages[0].page_content == state.messages[0].content
+
+    agent.client = QueryClient(["allocation logement"])
+    result = asyncio.run(agent.generate_search_query(state))
+    assert result["speculative"] is None
+    assert agent.speculation == {"reused": 1, "discarded": 1}
+
+
+def test_search_reuses_the_speculative_passages():
+    store = SlowStore()
+    speculative = SpeculativeSearch(
+        query="Refaire mon permis",
+        passages=[
+            Document(
+                page_content="Fiche permis",
+                metadata={"title": "Permis", "sp_url": "https://sp.fr/F1"},
+            )
+        ],
+    )
+
+    async def run():
+        speculative_search.set(speculative)
+        agent_search_store.set(store)
+        return await search.ainvoke({"queries": ["refaire mon permis", "permis"]})
+
+    context = asyncio.run(run())
+
+    assert store.queries == ["permis"]
+    assert "https://sp.fr/F1" in context
+
+
+def test_compact_history_prunes_previous_turns():
+    agent = MesDroitsAgent(search_tools=[slow_search], client=None, history_messages=2)
+    old_turn = [
+        HumanMessage(content="Première question", id="h1"),
+        AIMessage(content="Première réponse", id="a1"),
+    ]
+    last_turn = [
+        HumanMessage(content="Deuxième question", id="h2"),
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "slow_search", "args": {"query": "q"}, "id": "1"}],
+            id="c2",
+        ),
+        ToolMessage(content="Contexte", tool_call_id="1", name="slow_search", id="t2"),
+        AIMessage(content="Deuxième réponse", id="a2"),
+    ]
+    question = HumanMessage(content="Troisième question", id="h3")
+    state = AgentState(messages=old_turn + last_turn + [question])
+
+    result = asyncio.run(agent.compact_history(state))
+
+    assert [m.id for m in result["messages"]] == ["h1", "a1", "c2", "t2"]
+    assert add_messages(state.messages, result["messages"]) == [
+        last_turn[0],
+        last_turn[-1],
+        question,
+    ]
+
+
+def test_end_turn_prunes_the_answered_turn():
+    agent = MesDroitsAgent(search_tools=[slow_search], client=None, history_messages=2)
+    turn = [
+        HumanMessage(content="Question", id="h1"),
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "slow_search", "args": {"query": "q"}, "id": "1"}],
+            id="c1",
+        ),
+        ToolMessage(content="Contexte", tool_call_id="1", name="slow_search", id="t1"),
+        AIMessage(content="Réponse", id="a1"),
+    ]
+    state = AgentState(
+        messages=turn,
+        speculative=SpeculativeSearch(query="question", passages=[]),
+    )
+
+    result = asyncio.run(agent.end_turn(state))
+
+    assert result["speculative"] is None
+    assert add_messages(state.messages, result["messages"]) == [turn[0], turn[-1]]
+    assert ("generate_response", "end_turn") in agent.graph.builder.edges
+
+
+class EmptyAnswerClient:
+    """Fake client searching once, then answering with an empty message."""
+
+    def bind_tools(self, tools, tool_choice=None):
+        return self
+
+    def with_structured_output(self, schema):
+        return self
+
+    async def ainvoke(self, messages):
+        if isinstance(messages[-1], HumanMessage):
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": "slow_search", "args": {"query": "q"}, "id": "1"}],
+            )
+        if isinstance(messages[-1], ToolMessage) and messages[-1].name:
+            return Assertions(
+                assertions=[Assertion(assertion="Oui", source="https://sp.fr/F1")]
+            )
+        return AIMessage(content="")
+
+
+def test_end_turn_keeps_an_empty_answer():
+    agent = MesDroitsAgent(search_tools=[slow_search], client=EmptyAnswerClient())
+    state = AgentState(messages=[HumanMessage(content="Question")])
+
+    result = asyncio.run(agent.graph.ainvoke(state))
+
+    assert [m.type for m in result["messages"]] == ["human", "ai"]
+    assert result["messages"][-1].content == ""
+
+
+def test_search_tool_uses_the_agent_store():
+    store = SlowStore()
+    agent = MesDroitsAgent(search_tools=[search], client=None, search_store=store)
+    call = AIMessage(
+        content="",
+        tool_calls=[{"name": "search", "args": {"queries": ["permis"]}, "id": "1"}],
+    )
+    state = AgentState(messages=[HumanMessage(content="Permis ?"), call])
+
+    asyncio.run(agent.use_search_tool(state))
+
+    assert store.queries == ["permis"]
@@ -0,0 +1,145 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from redis import RedisError
+
+from assistant_mes_droits.agent.answer_cache import CachedAgent, conversation_key
+from assistant_mes_droits.agent.mes_droits_agent import AgentState
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisError("down")
+
+        return fail
+
+
+class FakeStore:
+    def __init__(self):
+        self.generation = 1
+
+    def refresh(self):
+        return False
+
+
+class FakeGraph:
+    def __init__(self):
+        self.runs = 0
+
+    async def ainvoke(self, input, config=None):
+        self.runs += 1
+        await asyncio.sleep(0.1)
+        answer = AIMessage(content=f"Réponse {self.runs}")
+        return {"messages": list(input.messages) + [answer]}
+
+    async def astream(self, input, config=None, stream_mode=None):
+        result = await self.ainvoke(input)
+        answer = result["messages"][-1]
+        yield "updates", {"generate_search_query": {"messages": []}}
+        yield "messages", (answer, {"langgraph_node": "generate_response"})
+        yield "updates", {"generate_response": {"messages": [answer]}}
+
+
+def question(content: str) -> AgentState:
+    return AgentState(messages=[HumanMessage(content=content)])
+
+
+def test_conversation_key_is_normalized():
+    assert conversation_key(
+        [HumanMessage(content="Comment refaire mon permis ?")]
+    ) == conversation_key([HumanMessage(content="comment  refaire mon PERMIS")])
+    assert conversation_key([HumanMessage(content="permis")]) != conversation_key(
+        [AIMessage(content="permis")]
+    )
+
+
+def test_answers_are_cached_per_generation(fake_redis):
+    graph, store = FakeGraph(), FakeStore()
+    agent = CachedAgent(graph, store, fake_redis, ttl=60)
+
+    first = asyncio.run(agent.ainvoke(question("Refaire mon permis ?")))
+    second = asyncio.run(agent.ainvoke(question("refaire mon permis")))
+
+    assert graph.runs == 1
+    assert second["messages"][-1].content == first["messages"][-1].content
+    assert agent.hit_count(question("refaire mon permis").messages) == 1
+    assert agent.stats == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert 60 in fake_redis.ttls.values()
+
+    store.generation = 2
+    asyncio.run(agent.ainvoke(question("refaire mon permis")))
+    assert graph.runs == 2
+
+
+def test_concurrent_identical_questions_run_once(fake_redis):
+    graph = FakeGraph()
+    agent = CachedAgent(graph, FakeStore(), fake_redis)
+
+    async def ask():
+        return await asyncio.gather(
+            *(agent.ainvoke(question("Refaire mon permis ?")) for _ in range(5)),
+            agent.ainvoke(question("Autre question")),
+        )
+
+    results = asyncio.run(ask())
+
+    assert graph.runs == 2
+    assert len({r["messages"][-1].content for r in results[:5]}) == 1
+
+
+def test_cached_answer_is_streamed(fake_redis):
+    graph = FakeGraph()
+    agent = CachedAgent(graph, FakeStore(), fake_redis)
+
+    async def stream():
+        return [
+            chunk
+            async for chunk in agent.astream(
+                question("permis"), stream_mode=["updates", "messages"]
+            )
+        ]
+
+    miss, hit = asyncio.run(stream()), asyncio.run(stream())
+
+    assert graph.runs == 1
+    assert [mode for mode, _ in miss] == ["updates", "messages", "updates"]
+    assert [mode for mode, _ in hit] == ["messages", "updates"]
+    assert hit[0][1][0].content == "Réponse 1"
+
+
+def test_redis_errors_fall_back_to_the_graph():
+    graph = FakeGraph()
+    agent = CachedAgent(graph, FakeStore(), BrokenRedis())
+
+    result = asyncio.run(agent.ainvoke(question("permis")))
+
+    assert result["messages"][-1].content == "Réponse 1"
+
+
+def test_cached_answer_is_added_to_the_thread(fake_redis):
+    async def generate_response(state: AgentState):
+        await asyncio.sleep(0)
+        return {"messages": [AIMessage(content="Réponse")]}
+
+    builder = StateGraph(AgentState)
+    builder.add_node("generate_response", generate_response)
+    builder.add_edge(START, "generate_response")
+    builder.add_edge("generate_response", END)
+    graph = builder.compile(checkpointer=InMemorySaver())
+    agent = CachedAgent(graph, FakeStore(), fake_redis)
+
+    async def ask(thread_id):
+        config = {"configurable": {"thread_id": thread_id}}
+        await agent.ainvoke(question("permis"), config=config)
+        return (await graph.aget_state(config)).values["messages"]
+
+    first, second = asyncio.run(ask("t1")), asyncio.run(ask("t2"))
+
+    assert agent.stats["hits"] == 1
+    assert [m.content for m in second] == [m.content for m in first]
+    # The next question of t1 has a history, its key differs
+    asyncio.run(ask("t1"))
+    assert agent.stats["misses"] == 2
@@ -0,0 +1,68 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+
+from assistant_mes_droits.agent.checkpointer import (
+    BoundedInMemorySaver,
+    RedisCheckpointSaver,
+)
+from assistant_mes_droits.agent.mes_droits_agent import AgentState
+
+
+async def answer(state: AgentState):
+    return {"messages": [AIMessage(content=f"Réponse {len(state.messages)}")]}
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(AgentState)
+    builder.add_node("generate_response", answer)
+    builder.add_edge(START, "generate_response")
+    builder.add_edge("generate_response", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_threads_are_kept_between_turns_and_deleted(fake_redis):
+    saver = RedisCheckpointSaver(fake_redis, ttl=60)
+    graph = build_graph(saver)
+    config = {"configurable": {"thread_id": "t1"}}
+
+    async def chat(content):
+        state = AgentState(messages=[HumanMessage(content=content)])
+        return await graph.ainvoke(state, config=config)
+
+    asyncio.run(chat("Bonjour"))
+    result = asyncio.run(chat("Et ensuite ?"))
+
+    assert [m.content for m in result["messages"]] == [
+        "Bonjour",
+        "Réponse 1",
+        "Et ensuite ?",
+        "Réponse 3",
+    ]
+    # Only the latest checkpoint of the thread is stored, in a single key
+    assert list(fake_redis.data) == ["checkpoint:t1"]
+    assert fake_redis.ttls["checkpoint:t1"] == 60
+    assert len(list(saver.list(config))) == 1
+
+    saver.delete_thread("t1")
+    assert asyncio.run(graph.aget_state(config)).values == {}
+    result = asyncio.run(chat("Nouveau"))
+    assert [m.content for m in result["messages"]] == ["Nouveau", "Réponse 1"]
+
+
+def test_in_memory_saver_keeps_the_latest_threads():
+    saver = BoundedInMemorySaver(max_threads=2)
+    graph = build_graph(saver)
+
+    async def chat(thread_id):
+        state = AgentState(messages=[HumanMessage(content="Bonjour")])
+        config = {"configurable": {"thread_id": thread_id}}
+        return await graph.ainvoke(state, config=config)
+
+    for thread_id in ("t1", "t2", "t1", "t3"):
+        asyncio.run(chat(thread_id))
+
+    assert set(saver.storage) == {"t1", "t3"}
+    saver.delete_thread("t1")
+    assert set(saver.storage) == {"t3"}
@@ -0,0 +1,66 @@
+from langchain_core.documents import Document
+
+from assistant_mes_droits.agent.context_packer import ContextPacker, content_lines
+from assistant_mes_droits.data_processing.models import PublicationModel
+
+
+def fiche(i: int, paragraphs: list[str], score: float) -> Document:
+    publication = PublicationModel(
+        id=f"F{i}",
+        sp_url=f"https://www.service-public.fr/F{i}",
+        title=f"Fiche {i}",
+        paragraphs=paragraphs,
+        links=[{"text": "Voir aussi", "target": "https://example.com"}],
+        breadcrumbs=[{"label": "Particuliers"}, {"label": "Logement"}],
+    )
+    return Document(
+        page_content=publication.to_markdown(),
+        metadata={
+            "title": publication.title,
+            "sp_url": publication.sp_url,
+            "rrf_score": score,
+        },
+    )
+
+
+def test_content_lines_drop_boilerplate():
+    lines = content_lines(fiche(1, ["Premier paragraphe."], 1.0).page_content)
+
+    assert lines == ["Premier paragraphe."]
+
+
+def test_pack_ranks_by_score_and_keeps_sources():
+    docs = [fiche(1, ["Moins pertinent."], 0.1), fiche(2, ["Plus pertinent."], 0.5)]
+
+    context = ContextPacker().pack(docs)
+
+    assert context.index("Fiche 2") < context.index("Fiche 1")
+    assert "Source: https://www.service-public.fr/F1" in context
+    assert "Source: https://www.service-public.fr/F2" in context
+    assert "Related Links" not in context
+    assert "Particuliers > Logement" not in context
+
+
+def test_pack_skips_duplicate_paragraphs():
+    shared = "Ce paragraphe est repris dans les deux fiches."
+    docs = [fiche(1, [shared, "Propre à 1."], 0.5), fiche(2, [shared], 0.4)]
+
+    context = ContextPacker().pack(docs)
+
+    assert context.count(shared) == 1
+    # Fiche 2 brings nothing new
+    assert "Fiche 2" not in context
+
+
+def test_pack_respects_the_budget():
+    docs = [
+        fiche(i, [f"Paragraphe {i}.{j} " + "mot " * 50 for j in range(20)], 1 / (i + 1))
+        for i in range(20)
+    ]
+    packer = ContextPacker(max_tokens=1000, max_fiche_tokens=400, chars_per_token=4)
+
+    context = packer.pack(docs)
+
+    assert len(context) <= 4000
+    assert context.count("Source: ") == 3
+    assert sum(len(d.page_content) for d in docs) > 10 * len(context)
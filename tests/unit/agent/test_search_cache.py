@@ -0,0 +1,134 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+from assistant_mes_droits.agent.search_cache import CachedSearch, normalize_query
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.requests = 0
+
+    def embed_documents(self, texts):
+        self.requests += 1
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = normalize_query(text).split()
+        return [float("permis" in words), float("essai" in words), 0.1]
+
+
+class FakeStore:
+    def __init__(self):
+        self.generation = 1
+        self.embeddings = FakeEmbeddings()
+        self.searches = []
+
+    def refresh(self):
+        return False
+
+    async def asearch_passages(self, queries, k=5):
+        return self.search_passages(queries, k)
+
+    def search_passages(self, queries, k=5):
+        self.searches.extend(queries)
+        return [
+            [
+                Document(
+                    page_content=f"Résultat {query}",
+                    metadata={
+                        "_id": f"{query}#0",
+                        "parent_id": query,
+                        "chunk_index": 0,
+                    },
+                ),
+                Document(
+                    page_content="Commun",
+                    metadata={
+                        "_id": "commun#0",
+                        "parent_id": "commun",
+                        "chunk_index": 0,
+                    },
+                ),
+            ]
+            for query in queries
+        ]
+
+
+def test_normalize_query():
+    assert normalize_query("  Période d'ESSAI ?") == "periode d essai"
+
+
+def test_cached_search_hits_and_invalidation(fake_redis):
+    store = FakeStore()
+    cache = CachedSearch(store, fake_redis, ttl=60, similarity_threshold=0.95)
+
+    first = cache.search("Permis de conduire", k=20)
+    assert cache.search("permis de  conduire !", k=20) == first
+    # Near-duplicate, same embedding
+    assert cache.search("permis", k=20) == first
+    assert store.searches == ["Permis de conduire"]
+    assert cache.stats == {"hits": 1, "similar_hits": 1, "misses": 1, "hit_rate": 2 / 3}
+    assert set(fake_redis.ttls.values()) == {60}
+
+    store.generation = 2
+    cache.search("Permis de conduire", k=20)
+    assert len(store.searches) == 2
+
+
+def test_cached_search_without_similarity(fake_redis):
+    store = FakeStore()
+    cache = CachedSearch(store, fake_redis)
+
+    cache.search("permis de conduire")
+    cache.search("permis")
+    assert store.searches == ["permis de conduire", "permis"]
+    assert store.embeddings.requests == 0
+
+
+def test_similar_queries_are_bounded_per_generation(fake_redis):
+    store = FakeStore()
+    cache = CachedSearch(
+        store, fake_redis, similarity_threshold=0.95, max_similar_entries=1
+    )
+
+    cache.search("permis")
+    cache.search("essai")
+    # The embedding of "permis" was dropped for the one of "essai"
+    cache.search("periode d essai")
+    cache.search("permis de conduire")
+    assert store.searches == ["permis", "essai", "permis de conduire"]
+
+    store.generation = 2
+    cache.search("permis")
+    assert list(cache._vectors) == ["search_cache:2:5"]
+
+
+def test_cached_search_many_batches_misses(fake_redis):
+    store = FakeStore()
+    cache = CachedSearch(store, fake_redis)
+    cache.search("permis")
+
+    results = cache.search_many(["permis", "logement", "travail"])
+    # Only the misses reach the store, in one batch
+    assert store.searches == ["permis", "logement", "travail"]
+    assert [doc.metadata["parent_id"] for doc in results] == [
+        "commun",
+        "permis",
+        "logement",
+        "travail",
+    ]
+
+
+def test_async_cached_search_shares_entries(fake_redis):
+    store = FakeStore()
+    cache = CachedSearch(store, fake_redis)
+    cache.search("permis")
+
+    results = asyncio.run(cache.asearch_many(["permis", "logement"]))
+    assert store.searches == ["permis", "logement"]
+    assert [doc.metadata["parent_id"] for doc in results] == [
+        "commun",
+        "permis",
+        "logement",
+    ]
@@ -1,9 +1,20 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.base import empty_checkpoint
+
+from assistant_mes_droits.agent.clients import checkpointer
+from assistant_mes_droits.agent.mes_droits_agent import (
+    Assertion,
+    CitedAnswer,
+    MesDroitsAgent,
+)
 
 # Update with your actual module path
-from assistant_mes_droits.alpine_app.main import app
+from assistant_mes_droits.alpine_app.main import app, stream_response
 
 
 @pytest.fixture
@@ -44,12 +55,130 @@ def test_chat_endpoint(test_client, valid_human_message):
         assert "content" in response.json()
 
 
+def test_chat_stream_endpoint(test_client, valid_human_message):
+    with test_client as client:
+        response = client.post(
+            "/chat/stream", json={"messages": [valid_human_message.dict()]}
+        )
+
+        assert response.status_code == 200
+        assert "text/event-stream" in response.headers["content-type"]
+        events = [
+            line.removeprefix("event: ")
+            for line in response.text.splitlines()
+            if line.startswith("event: ")
+        ]
+        assert events[0] == "node"
+        assert events[-2:] == ["message", "done"]
+
+
+@tool
+async def fake_search(queries: list[str]) -> str:
+    """Fake search returning one fiche."""
+    return "## Fiche 1\nSource: https://sp.fr/F1\nContenu"
+
+
+class StructuredClient:
+    """Fake chat model answering with a search call, then a cited answer."""
+
+    def bind_tools(self, tools, tool_choice=None):
+        return self
+
+    def with_structured_output(self, schema):
+        return CitingClient()
+
+    async def ainvoke(self, messages):
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": "fake_search", "args": {"queries": ["test"]}, "id": "1"}
+            ],
+        )
+
+
+class CitingClient:
+    async def ainvoke(self, messages):
+        return CitedAnswer(
+            answer="Oui ( https://sp.fr/F1 ).",
+            assertions=[Assertion(assertion="Oui", source="https://sp.fr/F1")],
+        )
+
+
+def test_chat_stream_sends_fast_mode_answer_as_token(
+    test_client, valid_human_message, monkeypatch
+):
+    agent = MesDroitsAgent(
+        search_tools=[fake_search], client=StructuredClient(), mode="fast"
+    )
+    monkeypatch.setattr(
+        "assistant_mes_droits.alpine_app.main.build_agent", lambda: agent.graph
+    )
+
+    with test_client as client:
+        response = client.post(
+            "/chat/stream", json={"messages": [valid_human_message.dict()]}
+        )
+
+    events = [
+        (event.removeprefix("event: "), data.removeprefix("data: "))
+        for event, data, _ in zip(*[iter(response.text.splitlines())] * 3)
+    ]
+    assert [event for event, _ in events][-5:] == [
+        "token",
+        "node",
+        "node",
+        "message",
+        "done",
+    ]
+    assert events[-5][1] == '{"content": "Oui ( https://sp.fr/F1 )."}'
+
+
+class ToolCallingGraph:
+    """Fake graph whose answer node only streams tool call chunks."""
+
+    async def astream(self, input, config=None, stream_mode=None):
+        chunk = AIMessageChunk(content="", tool_call_chunks=[])
+        yield "messages", (chunk, {"langgraph_node": "generate_response"})
+        answer = AIMessage(content="Réponse")
+        yield "updates", {"generate_response": {"messages": [answer]}}
+
+
+def test_stream_response_sends_answer_without_text_chunks(valid_human_message):
+    async def collect():
+        return [
+            event
+            async for event in stream_response(
+                ToolCallingGraph(), [valid_human_message]
+            )
+        ]
+
+    events = asyncio.run(collect())
+    assert [event.split("\n")[0] for event in events] == [
+        "event: token",
+        "event: node",
+        "event: message",
+        "event: done",
+    ]
+    assert events[0].split("\n")[1] == 'data: {"content": "R\\u00e9ponse"}'
+
+
 def test_reset_endpoint(test_client):
     response = test_client.post("/reset")
     assert response.status_code == 200
     assert response.json() == {"status": "success"}
 
 
+def test_reset_endpoint_drops_the_thread(test_client):
+    config = {"configurable": {"thread_id": "thread-to-reset", "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    asyncio.run(checkpointer.aput(config, checkpoint, {}, {}))
+
+    response = test_client.post("/reset", json={"thread_id": "thread-to-reset"})
+
+    assert response.status_code == 200
+    assert asyncio.run(checkpointer.aget_tuple(config)) is None
+
+
 def test_invalid_chat_request(test_client):
     with test_client as client:
         # Test invalid message format with proper type field
@@ -0,0 +1,23 @@
+from assistant_mes_droits.data_processing.chunking import chunk_publication
+from assistant_mes_droits.data_processing.models import PublicationModel
+
+
+def test_chunk_publication_repeats_title_and_bounds_size():
+    pub = PublicationModel(
+        id="F1",
+        title="Période d'essai",
+        paragraphs=[f"Paragraphe {i}. " * 20 for i in range(10)],
+        lists=[["un", "deux"]],
+    )
+    chunks = chunk_publication(pub, chunk_size=500, chunk_overlap=50)
+
+    assert len(chunks) > 1
+    assert chunks[0].startswith("# Période d'essai")
+    assert all(chunk.startswith("# Période d'essai") for chunk in chunks[1:])
+    assert all(len(chunk) <= 500 + len("# Période d'essai\n\n") for chunk in chunks)
+    assert any("- deux" in chunk for chunk in chunks)
+
+
+def test_short_publication_is_a_single_chunk():
+    pub = PublicationModel(id="F2", title="Court", paragraphs=["Texte"])
+    assert chunk_publication(pub) == [pub.to_markdown()]
@@ -0,0 +1,70 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from assistant_mes_droits.data_processing.download import fetch_zip
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    content = b"PK-archive-v1"
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", "Wed, 01 Oct 2025 00:00:00 GMT")
+        self.send_header("Content-Length", str(len(self.content)))
+        self.end_headers()
+        self.wfile.write(self.content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def archive_url():
+    ArchiveHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/vosdroits-latest.zip"
+    server.shutdown()
+
+
+def test_fetch_zip_sends_conditional_request(archive_url, tmp_path):
+    first = fetch_zip(archive_url, cache_dir=tmp_path)
+    assert first.changed
+    assert open(first.path, "rb").read() == ArchiveHandler.content
+
+    second = fetch_zip(archive_url, cache_dir=tmp_path)
+    assert not second.changed
+    assert second.sha256 == first.sha256
+    assert ArchiveHandler.requests[-1]["If-None-Match"] == '"v1"'
+
+
+def test_fetch_zip_detects_new_content(archive_url, tmp_path, monkeypatch):
+    fetch_zip(archive_url, cache_dir=tmp_path)
+    monkeypatch.setattr(ArchiveHandler, "content", b"PK-archive-v2")
+    monkeypatch.setattr(ArchiveHandler, "etag", '"v2"')
+
+    archive = fetch_zip(archive_url, cache_dir=tmp_path)
+    assert archive.changed
+    assert open(archive.path, "rb").read() == b"PK-archive-v2"
+
+
+def test_fetch_zip_offline_reuses_cache(archive_url, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        fetch_zip(archive_url, cache_dir=tmp_path, offline=True)
+
+    cached = fetch_zip(archive_url, cache_dir=tmp_path)
+    archive = fetch_zip(archive_url, cache_dir=tmp_path, offline=True)
+    assert archive.path == cached.path
+    assert not archive.changed
+    assert len(ArchiveHandler.requests) == 1
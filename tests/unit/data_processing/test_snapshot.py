@@ -0,0 +1,88 @@
+import zipfile
+
+import pytest
+
+from assistant_mes_droits.data_processing import snapshot as snapshot_module
+from assistant_mes_droits.data_processing.download import CachedArchive, file_sha256
+from assistant_mes_droits.data_processing.models import PublicationModel
+from assistant_mes_droits.data_processing.snapshot import (
+    archive_snapshot,
+    load_snapshot,
+    save_snapshot,
+)
+
+
+def make_publications(n):
+    return [
+        PublicationModel(
+            id=f"F{i}",
+            title=f"Fiche {i} é",
+            paragraphs=[f"Paragraphe {i}"],
+            lists=[["a", "b"]],
+            links=[{"text": "lien", "target": "https://example.com"}],
+        )
+        for i in range(n)
+    ]
+
+
+def test_snapshot_round_trip(tmp_path):
+    publications = make_publications(5)
+    path = tmp_path / "corpus.snap"
+    save_snapshot(iter(publications), path)
+
+    with load_snapshot(path) as snapshot:
+        assert len(snapshot) == 5
+        assert snapshot[3] == publications[3]
+        assert snapshot[-1] == publications[-1]
+        assert snapshot[1:3] == publications[1:3]
+        assert list(snapshot) == publications
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "empty.snap"
+    save_snapshot([], path)
+
+    with load_snapshot(path) as snapshot:
+        assert len(snapshot) == 0
+        with pytest.raises(IndexError):
+            snapshot[0]
+
+
+def test_load_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"x" * 64)
+
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+
+def write_archive(path, ids):
+    with zipfile.ZipFile(path, "w") as zf:
+        for pub_id in ids:
+            zf.writestr(f"{pub_id}.xml", f'<Publication ID="{pub_id}"/>')
+    return CachedArchive(
+        url="https://example.com", path=str(path), sha256=file_sha256(path)
+    )
+
+
+def test_archive_is_only_parsed_when_its_content_changes(tmp_path, monkeypatch):
+    parsed = []
+    iter_zip_content = snapshot_module.iter_zip_content
+
+    def recording_iter_zip_content(path):
+        parsed.append(path)
+        return iter_zip_content(path)
+
+    monkeypatch.setattr(snapshot_module, "iter_zip_content", recording_iter_zip_content)
+    archive = write_archive(tmp_path / "archive.zip", ["F1", "F2"])
+
+    for _ in range(2):
+        with archive_snapshot(archive) as publications:
+            assert [pub.id for pub in publications] == ["F1", "F2"]
+    assert len(parsed) == 1
+
+    archive = write_archive(tmp_path / "archive.zip", ["F3"])
+    with archive_snapshot(archive) as publications:
+        assert [pub.id for pub in publications] == ["F3"]
+    assert len(parsed) == 2
+    assert len(list(tmp_path.glob("*.snapshot"))) == 1
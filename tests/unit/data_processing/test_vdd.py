@@ -1,7 +1,12 @@
 import zipfile
 from io import BytesIO
 
-from assistant_mes_droits.data_processing.parse import parse_xml, parse_zip_content
+from assistant_mes_droits.data_processing.parse import (
+    iter_zip_content,
+    parse_xml,
+    parse_xml_stream,
+    parse_zip_content,
+)
 
 SAMPLE_XML = """
 <Publication ID="F78" spUrl="https://example.com">
@@ -27,3 +32,58 @@ def test_zip_parsing():
     pubs = parse_zip_content(zip_buffer.getvalue())
     assert len(pubs) == 1
     assert pubs[0].title == "Test Title"
+
+
+NESTED_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Publication ID="F1" spUrl="https://example.com/F1">
+    <dc:title xmlns:dc="http://purl.org/dc/elements/1.1/">Titre\xa0imbriqué</dc:title>
+    <Paragraphe>Avant</Paragraphe>
+    <Liste>
+        <Item>Premier</Item>
+        <Item>Second<Liste><Item>Interne</Item></Liste></Item>
+    </Liste>
+    <Liste><Item>Dernier</Item></Liste>
+</Publication>
+"""
+
+
+def test_stream_parsing_matches_parse_xml():
+    for xml in (SAMPLE_XML, NESTED_XML):
+        streamed = parse_xml_stream(BytesIO(xml.strip().encode("utf-8")))
+        assert streamed == parse_xml(xml.strip())
+
+
+def test_iter_zip_content_is_lazy():
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        zf.writestr("file1.xml", SAMPLE_XML)
+        zf.writestr("file2.xml", NESTED_XML)
+        zf.writestr("readme.txt", "not a publication")
+    zip_buffer.seek(0)
+
+    pubs = iter_zip_content(zip_buffer)
+    assert next(pubs).id == "F78"
+    assert [pub.id for pub in pubs] == ["F1"]
+
+
+def test_parallel_zip_parsing_keeps_archive_order():
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        for i in range(7):
+            zf.writestr(f"F{i}.xml", SAMPLE_XML.replace('ID="F78"', f'ID="F{i}"'))
+
+    serial = parse_zip_content(zip_buffer.getvalue())
+    parallel = parse_zip_content(zip_buffer.getvalue(), workers=2, chunk_size=2)
+    assert [pub.id for pub in parallel] == [f"F{i}" for i in range(7)]
+    assert parallel == serial
+
+
+def test_parallel_zip_parsing_reads_the_archive_path(tmp_path):
+    path = tmp_path / "archive.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        for i in range(5):
+            zf.writestr(f"F{i}.xml", SAMPLE_XML.replace('ID="F78"', f'ID="F{i}"'))
+
+    parallel = parse_zip_content(path, workers=2, chunk_size=2)
+    assert [pub.id for pub in parallel] == [f"F{i}" for i in range(5)]
+    assert parallel == parse_zip_content(str(path))
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from assistant_mes_droits.vector_store.embedding import GeminiAPIEmbeddings
+
+
+class FakeGenAIClient:
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+        self.models = self
+
+    def embed_content(self, model, contents):
+        with self._lock:
+            self.requests.append(list(contents))
+        # Later batches finish first to check the reassembly order
+        time.sleep(0.01 * (5 - len(self.requests) % 5))
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=[float(len(t))]) for t in contents]
+        )
+
+
+def test_embed_documents_batches_requests_in_order():
+    client = FakeGenAIClient()
+    embeddings = GeminiAPIEmbeddings(client=client, batch_size=3, max_concurrency=4)
+    texts = ["a" * i for i in range(1, 11)]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert vectors == [[float(i)] for i in range(1, 11)]
+    assert sorted(len(batch) for batch in client.requests) == [1, 3, 3, 3]
+
+
+def test_empty_texts_use_random_placeholder():
+    client = FakeGenAIClient()
+    embeddings = GeminiAPIEmbeddings(client=client, batch_size=2)
+
+    vectors = embeddings.embed_documents(["abc", "", "de"])
+
+    assert vectors[0] == [3.0]
+    assert vectors[1] == [32.0]  # uuid4 hex
+    assert vectors[2] == [2.0]
+    assert embeddings.embed_query("xyz") == [3.0]
+
+
+class ThrottledError(Exception):
+    code = 429
+
+
+class FakeAsyncGenAIClient:
+    """Async fake failing every request that contains a text from `throttled`."""
+
+    def __init__(self, throttled=()):
+        self.throttled = set(throttled)
+        self.requests = []
+        self.aio = SimpleNamespace(models=self)
+
+    async def embed_content(self, model, contents):
+        self.requests.append(list(contents))
+        if self.throttled & set(contents):
+            # Only fail once per text
+            self.throttled -= set(contents)
+            raise ThrottledError()
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=[float(len(t))]) for t in contents]
+        )
+
+
+def test_aembed_documents_retries_failed_items_only():
+    client = FakeAsyncGenAIClient(throttled={"ccc"})
+    embeddings = GeminiAPIEmbeddings(
+        client=client, batch_size=2, max_concurrency=4, retry_base_delay=0
+    )
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    vectors = asyncio.run(embeddings.aembed_documents(texts))
+
+    assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert client.requests[:3] == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+    assert client.requests[3:] == [["ccc", "dddd"]]
+    stats = embeddings.stats
+    assert stats["throttled"] == 1
+    assert stats["retried_items"] == 2
+    assert stats["concurrency_limit"] < 4
+
+
+def test_aembed_query_raises_after_max_retries():
+    class AlwaysThrottled(FakeAsyncGenAIClient):
+        async def embed_content(self, model, contents):
+            self.requests.append(list(contents))
+            raise ThrottledError()
+
+    client = AlwaysThrottled()
+    embeddings = GeminiAPIEmbeddings(client=client, max_retries=2, retry_base_delay=0)
+
+    with pytest.raises(ThrottledError):
+        asyncio.run(embeddings.aembed_query("a"))
+    assert len(client.requests) == 3
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+from assistant_mes_droits.vector_store.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    model = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_cache_serves_repeated_texts(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "cache.sqlite")
+
+    assert cache.embed_documents(["ab", "abc", "ab"]) == [[2, 0.5], [3, 0.5], [2, 0.5]]
+    assert inner.calls == [["ab", "abc"]]
+    assert cache.embed_query("abc") == [3.0, 0.5]
+    assert len(inner.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # The cache persists across instances
+    reopened = CachedEmbeddings(inner, tmp_path / "cache.sqlite")
+    assert reopened.embed_query("ab") == [2.0, 0.5]
+    assert len(inner.calls) == 1
+
+
+def test_empty_texts_are_not_cached(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "cache.sqlite")
+
+    assert cache.embed_documents(["", "a", ""]) == [[0, 0.5], [1, 0.5], [0, 0.5]]
+    assert inner.calls == [["a", "", ""]]
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "cache.sqlite", max_entries=2)
+
+    cache.embed_query("a")
+    cache.embed_query("bb")
+    cache.embed_query("a")  # refresh "a"
+    cache.embed_query("ccc")  # evicts "bb"
+
+    assert len(cache) == 2
+    inner.calls.clear()
+    cache.embed_documents(["a", "ccc", "bb"])
+    assert inner.calls == [["bb"]]
+
+
+def test_entry_count_is_kept_without_scanning_the_table(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "cache.sqlite", max_entries=3)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    cache.embed_documents(["a", "bb"])
+    cache.embed_documents(["a", "ccc", "dddd"])  # evicts "bb"
+
+    assert not [sql for sql in statements if "COUNT" in sql.upper()]
+    assert len(cache) == 3
+    reopened = CachedEmbeddings(inner, tmp_path / "cache.sqlite", max_entries=3)
+    assert len(reopened) == 3
+
+
+def test_async_cache_access_runs_off_the_event_loop(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, tmp_path / "cache.sqlite")
+    threads = []
+
+    def recording_thread(method):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+
+        return wrapper
+
+    cache._get_many = recording_thread(cache._get_many)
+    cache._put_many = recording_thread(cache._put_many)
+
+    assert asyncio.run(cache.aembed_documents(["ab", "ab"])) == [[2, 0.5], [2, 0.5]]
+    assert asyncio.run(cache.aembed_query("ab")) == [2.0, 0.5]
+    assert inner.calls == [["ab"]]
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
+
+
+def test_model_defaults_to_the_embeddings_class(tmp_path):
+    class AnonymousEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return [[1.0] for _ in texts]
+
+        def embed_query(self, text):
+            return [1.0]
+
+    cache = CachedEmbeddings(AnonymousEmbeddings(), tmp_path / "cache.sqlite")
+    assert cache.model == "AnonymousEmbeddings"
+    assert cache.embed_query("a") == [1.0]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from assistant_mes_droits.vector_store.numpy_store import NumpyVectorStore
+
+
+def random_vectors(n, dimensions=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dimensions))
+
+
+def ivf_store(path, **kwargs):
+    return NumpyVectorStore(
+        path, embedding=None, dimensions=16, index="ivf", n_lists=8, **kwargs
+    )
+
+
+def test_full_probe_matches_exact_search(tmp_path):
+    vectors = random_vectors(300)
+    ids = [str(i) for i in range(300)]
+    exact = NumpyVectorStore(tmp_path / "exact", embedding=None, dimensions=16)
+    exact.upsert(ids, [""] * 300, vectors)
+    ivf = ivf_store(tmp_path / "ivf", n_probe=8)
+    ivf.upsert(ids, [""] * 300, vectors)
+
+    queries = random_vectors(20, seed=1)
+    for (exact_rows, _), (ivf_rows, _) in zip(
+        exact.top_k(queries, 10), ivf.top_k(queries, 10)
+    ):
+        assert list(ivf_rows) == list(exact_rows)
+    assert ivf.ivf.trained
+
+
+def test_incremental_writes_and_reload(tmp_path):
+    vectors = random_vectors(100)
+    store = ivf_store(tmp_path, n_probe=1)
+    store.upsert([str(i) for i in range(100)], [""] * 100, vectors)
+    store.train_index()
+
+    # Inserted after training, then a delete moves the last row into row 0
+    store.upsert(["new"], ["new"], [vectors[5] + 1e-3])
+    store.delete(["0"])
+    [(rows, _)] = store.top_k(vectors[5], 2)
+    assert {store._ids[row] for row in rows} == {"5", "new"}
+
+    store.persist()
+    reloaded = ivf_store(tmp_path, n_probe=1)
+    assert reloaded.ivf.trained
+    assert list(reloaded.ivf.assignments) == list(store.ivf.assignments[:100])
+    [(rows, _)] = reloaded.top_k(vectors[5], 2)
+    assert {reloaded._ids[row] for row in rows} == {"5", "new"}
@@ -0,0 +1,219 @@
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from assistant_mes_droits.data_processing.models import PublicationModel
+from assistant_mes_droits.vector_store.numpy_store import NumpyVectorStore
+from assistant_mes_droits.vector_store.vector_store import PublicationVectorStore
+
+VOCABULARY = ["permis", "conduire", "essai", "travail", "factures", "logement"]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    model = "bag-of-words"
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(w)) + 0.01 for w in VOCABULARY]
+
+
+@pytest.fixture
+def numpy_store(tmp_path):
+    return NumpyVectorStore(tmp_path, BagOfWordsEmbeddings(), dimensions=6)
+
+
+def test_search_returns_best_matches(numpy_store):
+    numpy_store.add_texts(
+        ["permis de conduire", "période d essai au travail", "payer ses factures"],
+        metadatas=[{"title": "A"}, {"title": "B"}, {"title": "C"}],
+        ids=["A", "B", "C"],
+    )
+
+    results = numpy_store.similarity_search_with_score("essai travail", k=2)
+    assert len(results) == 2
+    assert results[0][0].metadata["_id"] == "B"
+    assert results[0][0].metadata["title"] == "B"
+    assert 0 <= results[1][1] < results[0][1] <= 1
+
+
+def test_upsert_delete_and_reload(numpy_store, tmp_path):
+    numpy_store.add_texts(["permis", "essai", "factures"], ids=["A", "B", "C"])
+    numpy_store.add_texts(["logement"], ids=["A"])
+    numpy_store.delete(ids=["B"])
+
+    assert len(numpy_store) == 2
+    assert [doc.page_content for doc in numpy_store.get_by_ids(["A", "C"])] == [
+        "logement",
+        "factures",
+    ]
+    numpy_store.persist()
+
+    reloaded = NumpyVectorStore(tmp_path, BagOfWordsEmbeddings(), dimensions=6)
+    assert isinstance(reloaded.vectors, np.memmap)
+    assert reloaded.similarity_search("logement", k=1)[0].metadata["_id"] == "A"
+
+    # Writes copy the memory-mapped matrix before modifying it
+    reloaded.add_texts(["essai"], ids=["D"])
+    assert len(reloaded) == 3
+    assert not numpy_store.refresh()
+    reloaded.persist()
+    assert numpy_store.refresh()
+    assert len(numpy_store) == 3
+
+
+def test_publication_store_runs_offline(tmp_path):
+    store = PublicationVectorStore(
+        backend="numpy",
+        local_path=tmp_path / "index",
+        embedding_cache_path=None,
+        embeddings=BagOfWordsEmbeddings(),
+        dimensions=6,
+    )
+    store.add_publications(
+        [
+            PublicationModel(id="F1", title="Permis", paragraphs=["permis conduire"]),
+            PublicationModel(id="F2", title="Essai", paragraphs=["essai travail"]),
+        ]
+    )
+
+    results = store.search("permis conduire", k=1)
+    assert results[0].metadata["parent_id"] == "F1"
+    assert "content_hash" not in results[0].metadata
+    assert "content_hash" in store.search("permis", k=1, fields=None)[0].metadata
+
+    store.add_publications(
+        [PublicationModel(id="F2", title="Essai", paragraphs=["essai travail"])],
+        incremental=True,
+    )
+    assert [doc.metadata["parent_id"] for doc in store.search("permis", k=5)] == ["F2"]
+
+    store.delete_publication("F2")
+    assert len(store.vector_store) == 0
+
+
+def local_publication_store(path, **kwargs):
+    return PublicationVectorStore(
+        backend="numpy",
+        local_path=path,
+        embedding_cache_path=None,
+        embeddings=BagOfWordsEmbeddings(),
+        dimensions=6,
+        **kwargs,
+    )
+
+
+def test_search_many_returns_each_publication_once(tmp_path):
+    store = local_publication_store(tmp_path)
+    store.add_publications(
+        [
+            PublicationModel(id="F1", title="Permis", paragraphs=["permis conduire"]),
+            PublicationModel(id="F2", title="Essai", paragraphs=["essai travail"]),
+            PublicationModel(id="F3", title="Logement", paragraphs=["logement"]),
+        ]
+    )
+
+    results = store.search_many(["permis", "permis conduire", "travail"], k=2)
+    ids = [doc.metadata["parent_id"] for doc in results]
+    assert ids[0] == "F1"
+    assert sorted(ids) == sorted(set(ids))
+    assert store.search_many([]) == []
+
+    async_results = asyncio.run(
+        store.asearch_many(["permis", "permis conduire", "travail"], k=2)
+    )
+    assert async_results == results
+
+
+def test_delete_chunked_publication(tmp_path):
+    store = local_publication_store(tmp_path, chunk_size=20, chunk_overlap=0)
+    store.add_publications(
+        [
+            PublicationModel(
+                id="F1", title="Permis", paragraphs=["permis conduire " * 5]
+            ),
+            PublicationModel(id="F2", title="Essai", paragraphs=["essai travail"]),
+        ]
+    )
+    generation = store.generation
+
+    assert store.delete_publication("F1") is True
+    assert [doc.metadata["parent_id"] for doc in store.search("permis", k=5)] == ["F2"]
+    assert store.generation == generation + 1
+    assert store.delete_publication("F1") is False
+    assert store.generation == generation + 1
+
+
+def test_reindex_switches_generation(tmp_path):
+    store = local_publication_store(tmp_path)
+    reader = local_publication_store(tmp_path, pointer_ttl=0)
+    store.add_publications(
+        [PublicationModel(id="F1", title="Permis", paragraphs=["permis conduire"])]
+    )
+    assert store.generation == 1
+
+    generation = store.reindex(
+        [PublicationModel(id="F2", title="Essai", paragraphs=["essai travail"])]
+    )
+    assert generation == store.generation == 2
+    assert [doc.metadata["parent_id"] for doc in store.search("permis", k=5)] == ["F2"]
+    # The previous generation is dropped, readers follow the pointer
+    assert not (tmp_path / "vectors.npy").exists()
+    assert [doc.metadata["parent_id"] for doc in reader.search("essai", k=5)] == ["F2"]
+    assert reader.generation == 2
+
+    store.reindex([])
+    assert not (tmp_path / "g2").exists()
+    assert reader.search("essai", k=5) == []
+
+
+def test_source_is_recorded_once_indexing_succeeds(tmp_path):
+    store = local_publication_store(tmp_path)
+    publication = PublicationModel(id="F1", title="Permis", paragraphs=["permis"])
+    assert store.indexed_source() is None
+
+    with patch.object(store, "_persist", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            store.add_publications([publication], source="sha-1")
+    assert store.indexed_source() is None
+
+    store.add_publications([publication], source="sha-1")
+    store.delete_publication("F1")
+    assert local_publication_store(tmp_path).indexed_source() == "sha-1"
+    store.reindex([publication], source="sha-2")
+    assert store.indexed_source() == "sha-2"
+
+
+def test_update_in_place_fails_after_a_concurrent_reindex(tmp_path):
+    store = local_publication_store(tmp_path)
+    other = local_publication_store(tmp_path)
+    store.add_publications(
+        [PublicationModel(id="F1", title="Permis", paragraphs=["permis conduire"])]
+    )
+    other.reindex([PublicationModel(id="F2", title="Essai", paragraphs=["essai"])])
+
+    with pytest.raises(RuntimeError, match="pointer moved"):
+        store.delete_publication("F1")
+    # The pointer still targets the re-indexed generation
+    assert local_publication_store(tmp_path).location == other.location == "g2"
+
+
+def test_reindex_keeps_live_generation_on_count_mismatch(tmp_path):
+    store = local_publication_store(tmp_path)
+    store.reindex(
+        [PublicationModel(id="F1", title="Permis", paragraphs=["permis conduire"])]
+    )
+
+    with patch.object(store, "_count_documents", return_value=0):
+        with pytest.raises(RuntimeError):
+            store.reindex(
+                [PublicationModel(id="F2", title="Essai", paragraphs=["essai"])]
+            )
+    assert store.generation == 1
+    assert local_publication_store(tmp_path).generation == 1
+    assert [doc.metadata["parent_id"] for doc in store.search("permis", k=5)] == ["F1"]
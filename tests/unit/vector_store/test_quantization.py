@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from assistant_mes_droits.vector_store.numpy_store import NumpyVectorStore, normalize
+from assistant_mes_droits.vector_store.quantization import (
+    TruncatedEmbeddings,
+    VectorQuantizer,
+)
+
+
+def random_vectors(n, dimensions=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return normalize(rng.standard_normal((n, dimensions)).astype(np.float32))
+
+
+def leading_dimension_vectors(n, seed=0):
+    # Most of the signal in the first dimensions, like Matryoshka embeddings
+    vectors = random_vectors(n, seed=seed)
+    vectors[:, 12:] *= 0.05
+    return normalize(vectors)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_scores_are_close(dtype):
+    vectors = random_vectors(50)
+    query = random_vectors(1, seed=1)[0]
+    quantizer = VectorQuantizer(dtype)
+    codes, scales = quantizer.encode(vectors)
+
+    assert codes.dtype == np.dtype(dtype)
+    np.testing.assert_allclose(
+        quantizer.scores(codes, scales, query), vectors @ query, atol=0.02
+    )
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"quantization": "int8"},
+        {"quantization": "float16", "reduced_dimensions": 16},
+        {"quantization": "int8", "reduced_dimensions": 16, "projection": "pca"},
+    ],
+)
+def test_rescored_results_match_exact_search(tmp_path, kwargs):
+    vectors = leading_dimension_vectors(200)
+    ids = [str(i) for i in range(200)]
+    exact = NumpyVectorStore(tmp_path / "exact", embedding=None, dimensions=32)
+    exact.upsert(ids, [""] * 200, vectors)
+    quantized = NumpyVectorStore(
+        tmp_path / "quantized",
+        embedding=None,
+        dimensions=32,
+        rescore_factor=8,
+        **kwargs,
+    )
+    quantized.upsert(ids, [""] * 200, vectors)
+
+    queries = leading_dimension_vectors(10, seed=1)
+    for (exact_rows, exact_scores), (rows, scores) in zip(
+        exact.top_k(queries, 3), quantized.top_k(queries, 3)
+    ):
+        assert list(rows) == list(exact_rows)
+        # Scores come from the full vectors
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-6)
+
+
+def test_codes_follow_writes_and_reload(tmp_path):
+    vectors = random_vectors(20)
+    store = NumpyVectorStore(
+        tmp_path, embedding=None, dimensions=32, quantization="int8"
+    )
+    store.upsert([str(i) for i in range(20)], [""] * 20, vectors)
+    store.top_k(vectors[0], 1)
+    store.upsert(["new"], ["new"], [vectors[3]])
+    store.delete(["0"])
+    store.persist()
+
+    reloaded = NumpyVectorStore(
+        tmp_path, embedding=None, dimensions=32, quantization="int8"
+    )
+    assert reloaded._codes.dtype == np.int8
+    assert len(reloaded._codes) == len(reloaded) == 20
+    [(rows, _)] = reloaded.top_k(vectors[3], 2)
+    assert {reloaded._ids[row] for row in rows} == {"3", "new"}
+
+
+def test_truncated_embeddings():
+    class Fixed:
+        model = "fixed"
+
+        def embed_documents(self, texts):
+            return [[3.0, 4.0, 12.0] for _ in texts]
+
+        def embed_query(self, text):
+            return [3.0, 4.0, 12.0]
+
+    embeddings = TruncatedEmbeddings(Fixed(), dimensions=2)
+    assert embeddings.model == "fixed@2"
+    assert embeddings.embed_query("a") == pytest.approx([0.6, 0.8])
+    assert embeddings.embed_documents([]) == []
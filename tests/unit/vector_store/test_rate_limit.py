@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from assistant_mes_droits.vector_store.rate_limit import AIMDLimiter, TokenBucket
+
+
+def test_token_bucket_paces_acquisitions():
+    bucket = TokenBucket(rate=100, capacity=1)
+
+    async def acquire_all():
+        for _ in range(6):
+            await bucket.acquire()
+
+    start = time.monotonic()
+    asyncio.run(acquire_all())
+    assert time.monotonic() - start >= 0.045
+
+
+def test_aimd_limiter_adjusts_and_bounds_concurrency():
+    limiter = AIMDLimiter(initial_limit=2, max_limit=3, target_latency=1.0)
+    for _ in range(20):
+        limiter.on_success(latency=0.1)
+    assert limiter.limit == 3
+
+    limiter.on_throttle()
+    assert limiter.limit == 1.5
+    limiter.on_success(latency=2.0)
+    assert limiter.limit == 1
+    assert limiter.counters == {"throttled": 1, "slow_responses": 1}
+
+    peak = 0
+
+    async def task():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.001)
+
+    async def run_tasks():
+        await asyncio.gather(*(task() for _ in range(5)))
+
+    asyncio.run(run_tasks())
+    assert peak == 1
+    assert limiter.in_flight == 0
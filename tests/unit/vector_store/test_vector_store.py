@@ -1,18 +1,31 @@
-from unittest.mock import MagicMock, patch
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from langchain_core.documents import Document
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
 
 from assistant_mes_droits.data_processing.models import PublicationModel
-from assistant_mes_droits.vector_store.vector_store import PublicationVectorStore
+from assistant_mes_droits.vector_store.vector_store import (
+    PublicationVectorStore,
+    content_hash,
+    reciprocal_rank_fusion,
+)
 
 
 @pytest.fixture
 def mock_vector_store():
-    with patch("pymongo.MongoClient"), patch(
+    with patch(
+        "assistant_mes_droits.vector_store.vector_store.MongoClient"
+    ) as mongo_client, patch(
         "langchain_google_genai.GoogleGenerativeAIEmbeddings"
     ), patch("langchain_mongodb.MongoDBAtlasVectorSearch"), patch(
         "assistant_mes_droits.vector_store.vector_store.PublicationVectorStore._create_index"
     ):  # Mocked but no variable
+        # No generation pointer yet
+        database = mongo_client.return_value.__getitem__.return_value
+        database.__getitem__.return_value.find_one.return_value = None
         # Create instance with all dependencies mocked
         store = PublicationVectorStore()
 
@@ -21,24 +34,206 @@ def mock_vector_store():
         store.vector_store.add_documents = MagicMock()
         store.vector_store.delete = MagicMock(return_value=True)
         store.vector_store.similarity_search = MagicMock()
+        store.collection = MagicMock()
+        store.embeddings = MagicMock(model="fake-embedding")
+        store.embeddings.aembed_documents = AsyncMock(
+            side_effect=lambda texts: [[float(len(text))] for text in texts]
+        )
+        store._write_batch_with_retry = MagicMock()
 
         return store
 
 
+def written(store):
+    """(ids, documents) of every batch written, in order."""
+    return [
+        (call.args[1], call.args[0])
+        for call in store._write_batch_with_retry.call_args_list
+    ]
+
+
 def test_add_publications(mock_vector_store):
     publication = PublicationModel(title="Test", paragraphs=["Content"])
     mock_vector_store.add_publications([publication])
-    mock_vector_store.vector_store.add_documents.assert_called_once()
+    mock_vector_store._write_batch_with_retry.assert_called_once()
+    # Embedded through the rate limited async path
+    mock_vector_store.embeddings.aembed_documents.assert_awaited_once()
+    mock_vector_store.embeddings.embed_documents.assert_not_called()
 
 
 def test_delete_publication(mock_vector_store):
-    result = mock_vector_store.delete_publication("test_id")
-    mock_vector_store.vector_store.delete.assert_called_once_with(ids=["test_id"])
-    assert result is True
+    pointers = mock_vector_store.client["assistant_mes_droits"]["generations"]
+    delete_many = mock_vector_store.collection.delete_many
+    delete_many.return_value.deleted_count = 3
+    assert mock_vector_store.delete_publication("test_id") is True
+    delete_many.assert_called_once_with(
+        {"$or": [{"_id": "test_id"}, {"parent_id": "test_id"}]}
+    )
+    pointers.find_one_and_update.assert_called_once()
+
+    # Unknown publication: nothing deleted, the generation is unchanged
+    delete_many.return_value.deleted_count = 0
+    assert mock_vector_store.delete_publication("unknown") is False
+    pointers.find_one_and_update.assert_called_once()
+
+
+def test_pointer_is_bumped_only_if_not_moved(mock_vector_store):
+    pointers = mock_vector_store.client["assistant_mes_droits"]["generations"]
+    mock_vector_store.delete_publication("test_id")
+    query, update = pointers.find_one_and_update.call_args.args
+    assert query == {"_id": "publications", "location": "publications"}
+    assert update["$inc"] == {"generation": 1}
+
+    pointers.find_one_and_update.side_effect = DuplicateKeyError("moved")
+    pointers.find_one.return_value = {"generation": 2, "location": "publications_g2"}
+    with pytest.raises(RuntimeError, match="publications_g2"):
+        mock_vector_store.delete_publication("test_id")
 
 
 def test_search(mock_vector_store):
     mock_vector_store.search("query")
     mock_vector_store.vector_store.similarity_search.assert_called_once_with(
-        "query", k=5
+        "query",
+        k=5,
+        post_filter_pipeline=[
+            {
+                "$project": {
+                    "id": 1,
+                    "title": 1,
+                    "sp_url": 1,
+                    "parent_id": 1,
+                    "chunk_index": 1,
+                    "text": 1,
+                    "score": 1,
+                }
+            }
+        ],
+    )
+
+
+def test_add_publications_consumes_generator_in_batches(mock_vector_store):
+    publications = (
+        PublicationModel(id=f"F{i}", title="Test", paragraphs=["Content"])
+        for i in range(45)
+    )
+    mock_vector_store.batch_size = 20
+    with patch.object(mock_vector_store, "_delete_old_documents"):
+        mock_vector_store.add_publications(publications)
+
+    batches = written(mock_vector_store)
+    assert [len(ids) for ids, _ in batches] == [20, 20, 5]
+    assert [ids[0] for ids, _ in batches] == ["F0#0", "F20#0", "F40#0"]
+
+
+def test_incremental_add_skips_unchanged_and_deletes_missing(mock_vector_store):
+    unchanged = PublicationModel(id="F1", title="Same", paragraphs=["Content"])
+    changed = PublicationModel(id="F2", title="New", paragraphs=["Content"])
+    model = mock_vector_store.embeddings.model
+    mock_vector_store.chunk_size = None
+    mock_vector_store.collection = MagicMock()
+    mock_vector_store.collection.find.return_value = [
+        {
+            "_id": "F1",
+            "content_hash": content_hash(unchanged.to_markdown()),
+            "embedding_model": model,
+        },
+        {"_id": "F2", "content_hash": "outdated", "embedding_model": model},
+        {"_id": "F3", "content_hash": "removed", "embedding_model": model},
+    ]
+
+    with patch.object(mock_vector_store, "_delete_old_documents") as delete_old:
+        mock_vector_store.add_publications([unchanged, changed], incremental=True)
+
+    [(ids, documents)] = written(mock_vector_store)
+    assert ids == ["F2"]
+    assert documents[0].metadata["embedding_model"] == model
+    mock_vector_store.vector_store.delete.assert_any_call(ids=["F3"])
+    delete_old.assert_not_called()
+
+
+def test_add_publications_stores_passages_with_parent_id(mock_vector_store):
+    mock_vector_store.chunk_size = 300
+    mock_vector_store.chunk_overlap = 0
+    publication = PublicationModel(
+        id="F1", title="Long", paragraphs=[f"Paragraphe {i} " * 10 for i in range(5)]
+    )
+    with patch.object(mock_vector_store, "_delete_old_documents"):
+        mock_vector_store.add_publications([publication])
+
+    [(ids, documents)] = written(mock_vector_store)
+    assert len(ids) > 1
+    assert ids == [f"F1#{i}" for i in range(len(ids))]
+    assert all(doc.metadata["parent_id"] == "F1" for doc in documents)
+    assert all(len(doc.page_content) <= 320 for doc in documents)
+    assert set(documents[0].metadata) == {
+        "id",
+        "title",
+        "sp_url",
+        "embedding_model",
+        "parent_id",
+        "chunk_index",
+        "content_hash",
+        "date_added",
+    }
+
+
+def test_search_groups_passages_by_parent(mock_vector_store):
+    mock_vector_store.vector_store.similarity_search.return_value = [
+        Document(page_content="b1", metadata={"parent_id": "B", "chunk_index": 1}),
+        Document(page_content="a0", metadata={"parent_id": "A", "chunk_index": 0}),
+        Document(page_content="b0", metadata={"parent_id": "B", "chunk_index": 0}),
+    ]
+
+    results = mock_vector_store.search("query", k=3)
+    assert [doc.page_content for doc in results] == ["b0\n\nb1", "a0"]
+    assert results[0].metadata["chunk_index"] == [0, 1]
+
+
+def test_write_batch_upserts_unordered(mock_vector_store):
+    document = Document(page_content="Contenu", metadata={"title": "Test"})
+    PublicationVectorStore._write_batch_with_retry(
+        mock_vector_store, [document], ["F1"], [[0.5]]
+    )
+
+    mock_vector_store.collection.bulk_write.assert_called_once_with(
+        [
+            ReplaceOne(
+                {"_id": "F1"},
+                {"text": "Contenu", "embedding": [0.5], "title": "Test"},
+                upsert=True,
+            )
+        ],
+        ordered=False,
+    )
+    mock_vector_store.vector_store.delete.assert_not_called()
+
+
+def test_delete_old_documents_uses_top_level_date(mock_vector_store):
+    cutoff = datetime.now(UTC)
+    mock_vector_store._delete_old_documents(cutoff)
+    mock_vector_store.collection.find.assert_called_once_with(
+        {"date_added": {"$lt": cutoff}}, projection={"_id": 1}, batch_size=200
+    )
+
+
+def test_reciprocal_rank_fusion_deduplicates_publications():
+    def passage(parent_id, chunk_index):
+        return Document(
+            page_content=f"{parent_id}{chunk_index}",
+            metadata={
+                "_id": f"{parent_id}#{chunk_index}",
+                "parent_id": parent_id,
+                "chunk_index": chunk_index,
+            },
+        )
+
+    fused = reciprocal_rank_fusion(
+        [
+            [passage("A", 1), passage("B", 0), passage("A", 0)],
+            [passage("B", 0), passage("C", 0), passage("B", 1)],
+        ],
+        rrf_k=0,
     )
+    assert [doc.metadata["parent_id"] for doc in fused] == ["B", "A", "C"]
+    assert [doc.page_content for doc in fused] == ["B0\n\nB1", "A0\n\nA1", "C0"]
+    assert fused[0].metadata["rrf_score"] == 1.5